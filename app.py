@@ -4,369 +4,116 @@ Aplicación Flask para despliegue en Render
 Modelo de predicción de precios de inmuebles
 """
 
-from flask import Flask, request, jsonify, render_template_string
-import pandas as pd
-import numpy as np
-import joblib
+from flask import Flask, Response, g, request, jsonify
 import os
 from pathlib import Path
 
-app = Flask(__name__)
-
-# Configuración
-MODEL_PATH = './artifacts/modelo.joblib'
-SCALER_PATH = './artifacts/scaler.joblib'
-SAMPLE_DATA_PATH = './sample_data.csv'
-
-# HTML template para la interfaz web
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Predicción de Precios de Inmuebles</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }
-        .container {
-            background: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #2c3e50;
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .form-group {
-            margin-bottom: 20px;
-        }
-        label {
-            display: block;
-            margin-bottom: 5px;
-            font-weight: bold;
-            color: #34495e;
-        }
-        input[type="number"] {
-            width: 100%;
-            padding: 10px;
-            border: 2px solid #ddd;
-            border-radius: 5px;
-            font-size: 16px;
-        }
-        input[type="number"]:focus {
-            border-color: #3498db;
-            outline: none;
-        }
-        button {
-            background-color: #3498db;
-            color: white;
-            padding: 12px 30px;
-            border: none;
-            border-radius: 5px;
-            font-size: 16px;
-            cursor: pointer;
-            width: 100%;
-        }
-        button:hover {
-            background-color: #2980b9;
-        }
-        .result {
-            margin-top: 20px;
-            padding: 20px;
-            background-color: #e8f5e8;
-            border-radius: 5px;
-            border-left: 4px solid #27ae60;
-        }
-        .error {
-            background-color: #ffeaea;
-            border-left-color: #e74c3c;
-        }
-        .info {
-            background-color: #e3f2fd;
-            border-left: 4px solid #2196f3;
-            margin-bottom: 20px;
-        }
-        .metrics {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-            margin-top: 20px;
-        }
-        .metric {
-            background: #f8f9fa;
-            padding: 15px;
-            border-radius: 5px;
-            text-align: center;
-        }
-        .metric h3 {
-            margin: 0 0 10px 0;
-            color: #2c3e50;
-        }
-        .metric p {
-            margin: 0;
-            font-size: 18px;
-            font-weight: bold;
-            color: #27ae60;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🏠 Predicción de Precios de Inmuebles</h1>
-        
-        <div class="info">
-            <h3>📊 Información del Modelo</h3>
-            <p><strong>Algoritmo:</strong> Regresión Lineal</p>
-            <p><strong>R²:</strong> 97.83% | <strong>RMSE:</strong> 11.60 miles de dólares</p>
-            <p><strong>Variables:</strong> Tamaño (m²), Habitaciones, Edad (años)</p>
-        </div>
-
-        <form method="POST">
-            <div class="form-group">
-                <label for="size">Tamaño del inmueble (m²):</label>
-                <input type="number" id="size" name="size" min="40" max="120" step="1" required 
-                       placeholder="Ej: 80">
-            </div>
-            
-            <div class="form-group">
-                <label for="bedrooms">Número de habitaciones:</label>
-                <input type="number" id="bedrooms" name="bedrooms" min="1" max="5" step="1" required 
-                       placeholder="Ej: 3">
-            </div>
-            
-            <div class="form-group">
-                <label for="age">Edad del inmueble (años):</label>
-                <input type="number" id="age" name="age" min="1" max="35" step="1" required 
-                       placeholder="Ej: 15">
-            </div>
-            
-            <button type="submit">🔮 Predecir Precio</button>
-        </form>
-
-        {% if prediction %}
-        <div class="result">
-            <h3>💰 Resultado de la Predicción</h3>
-            <p><strong>Precio estimado:</strong> ${{ "%.0f"|format(prediction) }}k</p>
-            <p><strong>Características:</strong> {{ size }}m², {{ bedrooms }} habitaciones, {{ age }} años</p>
-        </div>
-        {% endif %}
-
-        {% if error %}
-        <div class="result error">
-            <h3>❌ Error</h3>
-            <p>{{ error }}</p>
-        </div>
-        {% endif %}
+from service import (
+    HTML_TEMPLATE, MODEL_PATH, SCALER_PATH, SAMPLE_DATA_PATH, registry,
+    api_batch_response, api_predict_response, current_handle, form_context,
+    get_model_handle, health_response, info_body, info_response, landing_page, load_model,
+    metrics, metrics_response, predict_price, readiness_response, render_page,
+    watch_model,
+)
+from metrics import CONTENT_TYPE, SIN_MEDIR
 
-        <div class="metrics">
-            <div class="metric">
-                <h3>📈 R²</h3>
-                <p>97.83%</p>
-            </div>
-            <div class="metric">
-                <h3>📊 RMSE</h3>
-                <p>11.60k</p>
-            </div>
-            <div class="metric">
-                <h3>🎯 MAE</h3>
-                <p>8.24k</p>
-            </div>
-        </div>
-    </div>
-</body>
-</html>
-"""
-
-def load_model():
-    """Cargar modelo y scaler"""
-    try:
-        # Intentar cargar desde la ubicación estándar
-        if os.path.exists('./artifacts/modelo.joblib') and os.path.exists('./artifacts/scaler.joblib'):
-            modelo = joblib.load('./artifacts/modelo.joblib')
-            scaler = joblib.load('./artifacts/scaler.joblib')
-            print("✅ Modelo cargado desde artifacts/")
-            return modelo, scaler
-        
-        # Si no existe, intentar entrenar automáticamente
-        print("⚠️  Modelo no encontrado, entrenando automáticamente...")
-        
-        # Crear datos de ejemplo y entrenar
-        import pandas as pd
-        import numpy as np
-        from sklearn.linear_model import LinearRegression
-        from sklearn.preprocessing import StandardScaler
-        from sklearn.model_selection import train_test_split
-        
-        # Datos de ejemplo
-        data = {
-            'size': [50, 60, 45, 70, 80, 90, 55, 65, 75, 85],
-            'bedrooms': [1, 2, 1, 3, 3, 4, 2, 2, 3, 4],
-            'age': [5, 10, 2, 15, 20, 25, 8, 12, 18, 22],
-            'price': [150, 180, 140, 220, 250, 300, 160, 190, 240, 280]
-        }
-        df = pd.DataFrame(data)
-        
-        # Preparar datos
-        X = df[['size', 'bedrooms', 'age']]
-        y = df['price']
-        
-        # Dividir y escalar
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        
-        # Entrenar modelo
-        modelo = LinearRegression()
-        modelo.fit(X_train_scaled, y_train)
-        
-        # Crear directorio y guardar
-        os.makedirs('artifacts', exist_ok=True)
-        joblib.dump(modelo, 'artifacts/modelo.joblib')
-        joblib.dump(scaler, 'artifacts/scaler.joblib')
-        
-        print("✅ Modelo entrenado y guardado automáticamente")
-        return modelo, scaler
-        
-    except Exception as e:
-        print(f"❌ Error cargando/entrenando modelo: {e}")
-        return None, None
+app = Flask(__name__)
 
-def predict_price(size, bedrooms, age):
-    """Realizar predicción de precio"""
-    try:
-        modelo, scaler = load_model()
-        if modelo is None or scaler is None:
-            return None, "Modelo no disponible. Ejecute primero el entrenamiento."
-        
-        # Validar rangos
-        if not (40 <= size <= 120):
-            return None, "Tamaño debe estar entre 40 y 120 m²"
-        if not (1 <= bedrooms <= 5):
-            return None, "Habitaciones debe estar entre 1 y 5"
-        if not (1 <= age <= 35):
-            return None, "Edad debe estar entre 1 y 35 años"
-        
-        # Preparar datos
-        datos = np.array([[size, bedrooms, age]])
-        datos_escalados = scaler.transform(datos)
-        
-        # Predicción
-        precio_predicho = modelo.predict(datos_escalados)[0]
-        
-        return precio_predicho, None
-    except Exception as e:
-        return None, f"Error en predicción: {str(e)}"
+@app.before_request
+def iniciar_medicion():
+    # Se etiqueta por regla de la ruta; las URL sin ruta (404) no se miden
+    if request.url_rule is not None:
+        g.peticion = metrics.iniciar(request.method, request.url_rule.rule)
+
+@app.after_request
+def registrar_status(response):
+    peticion = g.get('peticion')
+    if peticion is not None:
+        peticion.status = response.status_code
+    return response
+
+@app.teardown_request
+def terminar_medicion(exc=None):
+    # teardown_request se ejecuta siempre, también tras una excepción no
+    # controlada (after_request no): la petición cuenta como 500
+    peticion = g.pop('peticion', None)
+    if peticion is not None:
+        peticion.terminar()
+
+def _peticion():
+    return g.get('peticion', SIN_MEDIR)
+
+def _json(payload, status=200):
+    respuesta = jsonify(payload), status
+    _peticion().fase('render')
+    return respuesta
 
 @app.route('/')
 def home():
-    """Página principal"""
-    return render_template_string(HTML_TEMPLATE)
+    """Página principal (pre-renderizada y comprimida)"""
+    page = landing_page()
+    _peticion().fase('render')
+    if page.not_modified(request.headers.get('If-None-Match'),
+                         request.headers.get('If-Modified-Since')):
+        return Response(status=304, headers=page.headers())
+    body, encoding = page.negotiate(request.headers.get('Accept-Encoding'))
+    return Response(body, mimetype='text/html', headers=page.headers(encoding))
 
 @app.route('/', methods=['POST'])
 def predict():
     """Endpoint para predicción"""
-    try:
-        # Obtener datos del formulario
-        size = float(request.form['size'])
-        bedrooms = int(request.form['bedrooms'])
-        age = int(request.form['age'])
-        
-        # Realizar predicción
-        prediction, error = predict_price(size, bedrooms, age)
-        
-        if error:
-            return render_template_string(HTML_TEMPLATE, error=error)
-        
-        return render_template_string(
-            HTML_TEMPLATE, 
-            prediction=prediction,
-            size=size,
-            bedrooms=bedrooms,
-            age=age
-        )
-        
-    except Exception as e:
-        return render_template_string(HTML_TEMPLATE, error=f"Error: {str(e)}")
+    html = render_page(**form_context(request.form, _peticion()))
+    _peticion().fase('render')
+    return html
 
 @app.route('/api/predict', methods=['POST'])
 def api_predict():
     """API endpoint para predicción"""
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No se proporcionaron datos'}), 400
-        
-        size = float(data.get('size', 0))
-        bedrooms = int(data.get('bedrooms', 0))
-        age = int(data.get('age', 0))
-        
-        prediction, error = predict_price(size, bedrooms, age)
-        
-        if error:
-            return jsonify({'error': error}), 400
-        
-        return jsonify({
-            'prediction': round(prediction, 2),
-            'features': {
-                'size': size,
-                'bedrooms': bedrooms,
-                'age': age
-            },
-            'model_info': {
-                'algorithm': 'LinearRegression',
-                'r2': 0.9783,
-                'rmse': 11.60
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Error interno: {str(e)}'}), 500
+    payload, status = api_predict_response(request.get_json(silent=True), _peticion())
+    return _json(payload, status)
+
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    """API endpoint para predicción por lotes"""
+    payload, status = api_batch_response(request.get_json(silent=True), _peticion())
+    return _json(payload, status)
 
 @app.route('/api/health')
 def health():
     """Endpoint de salud"""
-    modelo, scaler = load_model()
-    status = "healthy" if modelo is not None and scaler is not None else "unhealthy"
-    
-    return jsonify({
-        'status': status,
-        'model_loaded': modelo is not None,
-        'scaler_loaded': scaler is not None
-    })
+    return _json(health_response())
+
+@app.route('/api/ready')
+def ready():
+    """Sonda de readiness"""
+    payload, status = readiness_response()
+    return _json(payload, status)
 
 @app.route('/api/info')
 def info():
-    """Información del modelo"""
-    return jsonify({
-        'name': 'Modelo de Predicción de Precios de Inmuebles',
-        'version': '1.0.0',
-        'algorithm': 'LinearRegression',
-        'features': ['size', 'bedrooms', 'age'],
-        'target': 'price',
-        'metrics': {
-            'r2': 0.9783,
-            'rmse': 11.60,
-            'mae': 8.24
-        },
-        'equation': 'Precio = 242.65 + 54.08 × size + 10.91 × bedrooms + 2.73 × age'
-    })
+    """Información del modelo (cuerpo precalculado por versión)"""
+    body = info_body()
+    _peticion().fase('render')
+    return Response(body, mimetype='application/json')
+
+@app.route('/metrics')
+def metricas():
+    """Métricas en formato de texto de Prometheus"""
+    body = metrics_response()
+    _peticion().fase('render')
+    return Response(body, content_type=CONTENT_TYPE.decode())
+
+# Cargar el modelo al arrancar el worker, no en la primera petición, y
+# vigilar las versiones nuevas en segundo plano
+current_handle()
+watch_model()
 
 if __name__ == '__main__':
     # Crear directorio de artefactos si no existe
     Path('./artifacts').mkdir(exist_ok=True)
     
     # Verificar si el modelo existe
-    modelo, scaler = load_model()
-    if modelo is None:
+    if current_handle() is None:
         print("⚠️  Modelo no encontrado. Ejecute primero el entrenamiento.")
         print("   python crispdm_inmuebles.py --data ./sample_data.csv")
     
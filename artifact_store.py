@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Escritura atómica de artefactos y bloqueo entre procesos
+Los ficheros se escriben en un temporal del mismo directorio y se renombran
+con os.replace, de modo que un lector nunca ve un artefacto a medio escribir
+
+Cada entrenamiento publica sus artefactos en un directorio versionado
+(artifacts/v<N>/) y el manifiesto (artifacts/manifest.json) apunta a la
+versión activa; sin manifiesto se usan los ficheros de artifacts/.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Fichero de bloqueo compartido por entrenamiento y carga en cada directorio
+LOCK_FILENAME = '.artifacts.lock'
+
+# umask del proceso, leída una vez al importar (os.umask solo se puede leer
+# cambiándola, y hacerlo en cada escritura afectaría a otros hilos)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_path(path):
+    """Ruta temporal que se renombra a `path` al salir sin errores"""
+    directorio = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directorio, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directorio, prefix='.' + os.path.basename(path) + '.',
+                               suffix='.tmp')
+    os.close(fd)
+    # mkstemp crea el fichero con 0600 y os.replace lo conservaría: se usan
+    # los permisos normales (0666 & ~umask), como open() o joblib.dump
+    os.chmod(tmp, 0o666 & ~_UMASK)
+    try:
+        yield tmp
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def atomic_dump(obj, path):
+    """joblib.dump atómico"""
+    import joblib
+    with atomic_path(path) as tmp:
+        joblib.dump(obj, tmp)
+
+
+def artifact_hash(paths):
+    """Hash SHA-256 combinado (12 hex) del contenido de los ficheros, en orden"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def atomic_write_bytes(data, path):
+    """Escribir bytes de forma atómica"""
+    with atomic_path(path) as tmp:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+
+
+@contextmanager
+def file_lock(directorio, shared=False):
+    """
+    Bloqueo de `directorio` entre procesos (flock sobre LOCK_FILENAME)
+
+    Los escritores toman el bloqueo exclusivo; los lectores, el compartido,
+    para no leer un modelo nuevo con un scaler viejo.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, LOCK_FILENAME), 'a+') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# Artefactos versionados: cada entrenamiento escribe un directorio v<N>/ y
+# después apunta el manifiesto a él con un único rename
+MANIFEST_FILENAME = 'manifest.json'
+VERSION_PREFIX = 'v'
+
+
+def _numeros_de_version(artifacts_dir):
+    numeros = []
+    try:
+        nombres = os.listdir(artifacts_dir)
+    except FileNotFoundError:
+        return numeros
+    for nombre in nombres:
+        sufijo = nombre[len(VERSION_PREFIX):]
+        if nombre.startswith(VERSION_PREFIX) and sufijo.isdigit() \
+                and os.path.isdir(os.path.join(artifacts_dir, nombre)):
+            numeros.append(int(sufijo))
+    return sorted(numeros)
+
+
+def new_version_dir(artifacts_dir):
+    """Crear el directorio de la siguiente versión; llamar con file_lock tomado"""
+    numeros = _numeros_de_version(artifacts_dir)
+    numero = numeros[-1] + 1 if numeros else 1
+    path = os.path.join(artifacts_dir, f'{VERSION_PREFIX}{numero}')
+    os.makedirs(path)
+    return path
+
+
+def read_manifest(artifacts_dir):
+    """Manifiesto publicado ({'version', 'path', 'created_at'}) o None (disposición antigua)"""
+    try:
+        with open(os.path.join(artifacts_dir, MANIFEST_FILENAME), 'rb') as f:
+            manifiesto = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    if not isinstance(manifiesto, dict) or 'path' not in manifiesto:
+        raise ValueError(f"Manifiesto inválido en {artifacts_dir}")
+    return manifiesto
+
+
+def publish_version(artifacts_dir, version_dir, keep=3):
+    """
+    Apuntar el manifiesto a `version_dir` (ya escrito por completo) y borrar
+    las versiones más antiguas, conservando las `keep` últimas
+    """
+    nombre = os.path.basename(os.path.normpath(version_dir))
+    manifiesto = {
+        'version': int(nombre[len(VERSION_PREFIX):]),
+        'path': nombre,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    atomic_write_bytes(json.dumps(manifiesto, indent=2).encode() + b'\n',
+                       os.path.join(artifacts_dir, MANIFEST_FILENAME))
+    # Un proceso que aún sirve una versión borrada la conserva en memoria
+    # (los pesos mapeados siguen siendo válidos tras el unlink)
+    for numero in _numeros_de_version(artifacts_dir)[:-keep]:
+        if numero != manifiesto['version']:
+            shutil.rmtree(os.path.join(artifacts_dir, f'{VERSION_PREFIX}{numero}'),
+                          ignore_errors=True)
+    return manifiesto
+
+
+def resolve_artifacts_dir(artifacts_dir):
+    """Directorio de la versión publicada, o `artifacts_dir` si no hay manifiesto"""
+    manifiesto = read_manifest(artifacts_dir)
+    if manifiesto is None:
+        return artifacts_dir
+    return os.path.join(artifacts_dir, manifiesto['path'])
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Aplicación ASGI nativa para el servicio de predicción
+Mismas rutas y contratos JSON que app.py, sin el puente WsgiToAsgi
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import service
+from metrics import CONTENT_TYPE, SIN_MEDIR
+
+# Lotes a partir de este tamaño (bytes) se puntúan fuera del event loop
+OFFLOAD_MIN_BYTES = int(os.environ.get('OFFLOAD_MIN_BYTES', 8192))
+
+# Pool dedicado al trabajo de CPU (parseo de lotes, NumPy, carga del modelo)
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('SCORING_THREADS', 4)),
+                               thread_name_prefix='scoring')
+
+
+async def run_sync(func, *args):
+    """Ejecutar una función bloqueante en el pool de scoring"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+async def _send(send, status, body, content_type, extra_headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode()),
+            *((k.lower().encode(), v.encode()) for k, v in extra_headers),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200, peticion=SIN_MEDIR):
+    body = service.json_body(payload)
+    peticion.fase('render')
+    await _send(send, status, body, b'application/json')
+
+
+async def send_html(send, html, status=200, peticion=SIN_MEDIR):
+    body = html.encode()
+    peticion.fase('render')
+    await _send(send, status, body, b'text/html; charset=utf-8')
+
+
+async def read_body(receive):
+    """Leer el cuerpo completo de la petición"""
+    partes = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        partes.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(partes)
+
+
+def _parse_json(body):
+    """JSON del cuerpo, o None si está vacío o es inválido (como get_json(silent=True))"""
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+def _header(scope, name):
+    """Valor de una cabecera de la petición (name en minúsculas, bytes)"""
+    for k, v in scope['headers']:
+        if k == name:
+            return v.decode('latin-1')
+    return None
+
+
+def _parse_form(body):
+    return {k: v[0] for k, v in parse_qs(body.decode('utf-8', 'replace')).items()}
+
+
+async def home(scope, receive, send, peticion):
+    """Página principal (pre-renderizada y comprimida)"""
+    page = service.landing_page()
+    peticion.fase('render')
+    if page.not_modified(_header(scope, b'if-none-match'),
+                         _header(scope, b'if-modified-since')):
+        return await _send(send, 304, b'', b'text/html; charset=utf-8', page.headers())
+    body, encoding = page.negotiate(_header(scope, b'accept-encoding'))
+    await _send(send, 200, body, b'text/html; charset=utf-8', page.headers(encoding))
+
+
+async def predict(scope, receive, send, peticion):
+    """Endpoint para predicción (formulario web)"""
+    form = _parse_form(await read_body(receive))
+    contexto = service.form_context(form, peticion)
+    await send_html(send, service.render_page(**contexto), peticion=peticion)
+
+
+async def api_predict(scope, receive, send, peticion):
+    """API endpoint para predicción"""
+    data = _parse_json(await read_body(receive))
+    # Una predicción cuesta ~1 µs: más barato en el loop que en un hilo
+    payload, status = service.api_predict_response(data, peticion)
+    await send_json(send, payload, status, peticion)
+
+
+def _batch(body, peticion):
+    return service.api_batch_response(_parse_json(body), peticion)
+
+
+async def api_predict_batch(scope, receive, send, peticion):
+    """API endpoint para predicción por lotes"""
+    body = await read_body(receive)
+    # Lotes pequeños no compensan el salto a otro hilo
+    if len(body) >= OFFLOAD_MIN_BYTES:
+        payload, status = await run_sync(_batch, body, peticion)
+    else:
+        payload, status = _batch(body, peticion)
+    await send_json(send, payload, status, peticion)
+
+
+async def health(scope, receive, send, peticion):
+    """Endpoint de salud"""
+    await send_json(send, service.health_response(), peticion=peticion)
+
+
+async def ready(scope, receive, send, peticion):
+    """Sonda de readiness"""
+    payload, status = service.readiness_response()
+    await send_json(send, payload, status, peticion)
+
+
+async def info(scope, receive, send, peticion):
+    """Información del modelo (cuerpo precalculado por versión)"""
+    body = service.info_body()
+    peticion.fase('render')
+    await _send(send, 200, body, b'application/json')
+
+
+async def metrics(scope, receive, send, peticion):
+    """Métricas en formato de texto de Prometheus"""
+    body = service.metrics_response()
+    peticion.fase('render')
+    await _send(send, 200, body, CONTENT_TYPE)
+
+
+ROUTES = {
+    ('GET', '/'): home,
+    ('POST', '/'): predict,
+    ('POST', '/api/predict'): api_predict,
+    ('POST', '/api/predict/batch'): api_predict_batch,
+    ('GET', '/api/health'): health,
+    ('GET', '/api/ready'): ready,
+    ('GET', '/api/info'): info,
+    ('GET', '/metrics'): metrics,
+}
+PATHS = {path for _, path in ROUTES}
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Cargar (o heredar del proceso padre) y precalentar el modelo
+            # antes de aceptar tráfico
+            await run_sync(service.warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            service.registry.stop_watching()
+            _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Punto de entrada ASGI"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    if scope['type'] != 'http':
+        return
+
+    method = scope['method']
+    path = scope['path']
+    handler = ROUTES.get(('GET' if method == 'HEAD' else method, path))
+    if handler is not None:
+        peticion = service.metrics.iniciar(method, path)
+
+        async def send_medido(message):
+            if message['type'] == 'http.response.start':
+                peticion.status = message['status']
+            await send(message)
+
+        try:
+            return await handler(scope, receive, send_medido, peticion)
+        finally:
+            peticion.terminar()
+    if path in PATHS:
+        return await _send(send, 405, b'Method Not Allowed', b'text/plain; charset=utf-8')
+    await _send(send, 404, b'Not Found', b'text/plain; charset=utf-8')
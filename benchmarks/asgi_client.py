@@ -0,0 +1,112 @@
+"""
+Cliente HTTP en proceso para aplicaciones ASGI (sin red ni sockets)
+"""
+
+import asyncio
+import json
+import time
+
+
+async def request(app, method, path, body=b'', headers=()):
+    """Enviar una petición a `app` y devolver (status, headers, body)"""
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+        headers = [(b'content-type', b'application/json'), *headers]
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'content-length', str(len(body)).encode()), *headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('127.0.0.1', 8000),
+    }
+    enviado = False
+    respuesta = {'status': None, 'headers': [], 'body': []}
+    terminado = asyncio.Event()
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await terminado.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            respuesta['status'] = message['status']
+            respuesta['headers'] = message.get('headers', [])
+        elif message['type'] == 'http.response.body':
+            respuesta['body'].append(message.get('body', b''))
+            if not message.get('more_body', False):
+                terminado.set()
+
+    await app(scope, receive, send)
+    return respuesta['status'], respuesta['headers'], b''.join(respuesta['body'])
+
+
+async def startup(app):
+    """Ejecutar el evento lifespan.startup si la aplicación lo soporta"""
+    mensajes = asyncio.Queue()
+    await mensajes.put({'type': 'lifespan.startup'})
+    listo = asyncio.Event()
+
+    async def receive():
+        return await mensajes.get()
+
+    async def send(message):
+        listo.set()
+
+    tarea = asyncio.create_task(app({'type': 'lifespan', 'asgi': {'version': '3.0'}}, receive, send))
+    espera = asyncio.create_task(listo.wait())
+    await asyncio.wait([tarea, espera], return_when=asyncio.FIRST_COMPLETED)
+    espera.cancel()
+    if tarea.done():
+        # La aplicación no soporta lifespan (p. ej. WsgiToAsgi)
+        tarea.exception()
+    return tarea
+
+
+async def load(app, method, path, body=b'', concurrency=32, requests=5000):
+    """
+    Lanzar `requests` peticiones con `concurrency` clientes simultáneos
+
+    Devuelve un dict con rps y percentiles de latencia en milisegundos.
+    """
+    latencias = []
+    restantes = requests
+
+    async def cliente():
+        nonlocal restantes
+        while restantes > 0:
+            restantes -= 1
+            t0 = time.perf_counter()
+            status, _, _ = await request(app, method, path, body)
+            latencias.append(time.perf_counter() - t0)
+            if status != 200:
+                raise RuntimeError(f"{method} {path} devolvió {status}")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrency)))
+    total = time.perf_counter() - t0
+
+    latencias.sort()
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1000
+
+    return {
+        'requests': len(latencias),
+        'concurrency': concurrency,
+        'seconds': round(total, 4),
+        'rps': round(len(latencias) / total, 1),
+        'p50_ms': round(percentil(50), 3),
+        'p95_ms': round(percentil(95), 3),
+        'p99_ms': round(percentil(99), 3),
+    }
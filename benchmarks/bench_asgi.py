@@ -0,0 +1,45 @@
+"""
+Throughput del puente WsgiToAsgi (Flask) frente a la aplicación ASGI nativa
+
+Uso (desde la raíz del repositorio, con el modelo ya entrenado):
+    python -m benchmarks.bench_asgi --requests 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+
+from benchmarks.asgi_client import load, startup
+
+CASOS = [
+    ('POST', '/api/predict', {'size': 80, 'bedrooms': 3, 'age': 15}),
+    ('GET', '/api/health', b''),
+    ('GET', '/', b''),
+]
+
+
+async def medir(nombre, app, args):
+    await startup(app)
+    for method, path, body in CASOS:
+        # Calentamiento
+        await load(app, method, path, body, args.concurrency, args.concurrency * 4)
+        r = await load(app, method, path, body, args.concurrency, args.requests)
+        print(f"{nombre:<8} {method:<5} {path:<14} {r['rps']:>10.1f} req/s   "
+              f"p50 {r['p50_ms']:.3f} ms   p99 {r['p99_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark WsgiToAsgi vs ASGI nativo')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    from asgiref.wsgi import WsgiToAsgi
+    from app import app as flask_app
+    from asgi_app import app as asgi_app
+
+    asyncio.run(medir('wsgi', WsgiToAsgi(flask_app), args))
+    asyncio.run(medir('asgi', asgi_app, args))
+
+
+if __name__ == '__main__':
+    main()
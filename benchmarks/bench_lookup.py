@@ -0,0 +1,61 @@
+"""
+Tabla de precios precalculada frente al modelo fusionado y la ruta sklearn
+
+Uso (desde la raíz del repositorio, con el modelo ya entrenado):
+    python -m benchmarks.bench_lookup --artifacts ./artifacts --rows 100000
+"""
+
+import argparse
+import timeit
+
+import joblib
+import numpy as np
+
+from artifact_store import resolve_artifacts_dir
+from inference import (
+    FUSED_FILENAME, TABLE_FILENAME, FusedLinearModel, TabulatedModel, predict_batch,
+)
+
+
+def _por_llamada(func, numero):
+    return min(timeit.repeat(func, number=numero, repeat=5)) / numero * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la tabla de precios')
+    parser.add_argument('--artifacts', default='./artifacts')
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    # Versión publicada en manifest.json (o artifacts/ con la disposición anterior)
+    directorio = resolve_artifacts_dir(args.artifacts)
+    modelo = joblib.load(f'{directorio}/modelo.joblib')
+    scaler = joblib.load(f'{directorio}/scaler.joblib')
+    fusionado = FusedLinearModel.load(f'{directorio}/{FUSED_FILENAME}')
+    tabulado = TabulatedModel.load(f'{directorio}/{TABLE_FILENAME}', fusionado)
+
+    x = np.array([[80.0, 3.0, 15.0]])
+    print("Predicción individual (µs por llamada):")
+    print(f"   • sklearn (transform + predict): {_por_llamada(lambda: predict_batch(modelo, scaler, x), 2000):9.3f}")
+    print(f"   • modelo fusionado:              {_por_llamada(lambda: fusionado.predict_one(80.0, 3, 15), 100000):9.3f}")
+    print(f"   • tabla (entrada entera):        {_por_llamada(lambda: tabulado.predict_one(80.0, 3, 15), 100000):9.3f}")
+    print(f"   • tabla (tamaño no entero):      {_por_llamada(lambda: tabulado.predict_one(80.5, 3, 15), 100000):9.3f}")
+
+    rng = np.random.default_rng(42)
+    X = np.column_stack([rng.integers(40, 121, args.rows), rng.integers(1, 6, args.rows),
+                         rng.integers(1, 36, args.rows)]).astype(np.float64)
+    idx = (X - [40, 1, 1]).astype(np.intp)
+    tabla = tabulado.tabla
+
+    print(f"\nLote de {args.rows} filas enteras (ns por fila):")
+    por_fila = 1e9 / args.rows
+    print(f"   • sklearn:          {_por_llamada(lambda: predict_batch(modelo, scaler, X), 3) * 1e-6 * por_fila:9.2f}")
+    print(f"   • modelo fusionado: {_por_llamada(lambda: fusionado.predict(X), 10) * 1e-6 * por_fila:9.2f}")
+    print(f"   • indexado tabla:   {_por_llamada(lambda: tabla[idx[:, 0], idx[:, 1], idx[:, 2]], 10) * 1e-6 * por_fila:9.2f}")
+
+    diferencia = np.max(np.abs(tabla[idx[:, 0], idx[:, 1], idx[:, 2]] - predict_batch(modelo, scaler, X)))
+    print(f"\nDiferencia máxima tabla vs sklearn: {diferencia:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Coste de registrar métricas: una fase y una petición completa
+
+Falla (código de salida 1) si registrar una fase supera el presupuesto.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_metricas --budget-ns 1000
+"""
+
+import argparse
+import sys
+import timeit
+
+from metrics import Metricas
+
+
+def _por_llamada(func, numero):
+    return min(timeit.repeat(func, number=numero, repeat=5)) / numero * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del registro de métricas')
+    parser.add_argument('--budget-ns', type=float, default=1000,
+                        help='Máximo por fase en ns (default: 1000)')
+    args = parser.parse_args()
+
+    metricas = Metricas()
+    peticion = metricas.iniciar('POST', '/api/predict')
+    peticion.fase('prediccion')
+
+    def vacia():
+        pass
+
+    def peticion_completa():
+        p = metricas.iniciar('POST', '/api/predict')
+        p.fase('parseo')
+        p.fase('modelo')
+        p.fase('cache')
+        p.fase('render')
+        p.terminar(200)
+
+    base = _por_llamada(vacia, 200000)
+    fase = _por_llamada(lambda: peticion.fase('prediccion'), 200000) - base
+    completa = _por_llamada(peticion_completa, 50000) - base
+    print("Coste del registro (ns, descontada la llamada vacía):")
+    print(f"   • una fase:                    {fase:9.0f}")
+    print(f"   • petición con 4 fases:        {completa:9.0f}")
+    print(f"   • iniciar + terminar (volcado): {completa - 4 * fase:9.0f}")
+
+    if fase > args.budget_ns:
+        print(f"❌ Una fase cuesta {fase:.0f} ns > {args.budget_ns:.0f} ns")
+        return 1
+    print(f"✅ Dentro del presupuesto de {args.budget_ns:.0f} ns por fase")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
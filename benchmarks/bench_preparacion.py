@@ -0,0 +1,81 @@
+"""
+Preparación de datos: versión pandas columna a columna frente al bloque NumPy
+
+Mide tiempo y pico de memoria (tracemalloc) de la limpieza sobre un
+DataFrame sintético con valores faltantes, duplicados y precios fuera de
+rango.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_preparacion --rows 10000000
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from crispdm_inmuebles import preparar_datos
+
+
+def preparar_pandas(df):
+    """Limpieza anterior: una copia completa por paso"""
+    df_limpio = df.copy()
+    for col in ["size", "bedrooms", "age", "price"]:
+        df_limpio[col] = pd.to_numeric(df_limpio[col], errors="coerce")
+    for col in ["size", "bedrooms", "age", "price"]:
+        df_limpio[col] = df_limpio[col].fillna(df_limpio[col].median())
+    df_limpio = df_limpio.drop_duplicates()
+    df_limpio = df_limpio[(df_limpio["price"] > 0) & (df_limpio["price"] < 1000)]
+    return df_limpio[["size", "bedrooms", "age"]], df_limpio["price"]
+
+
+def datos_sinteticos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    size = rng.integers(40, 121, n).astype(np.float64)
+    bedrooms = rng.integers(1, 6, n).astype(np.float64)
+    age = rng.integers(1, 36, n).astype(np.float64)
+    price = np.round(20 + 2.9 * size + 8 * bedrooms + 0.25 * age + rng.normal(0, 10, n), 1)
+    size[rng.random(n) < 0.01] = np.nan
+    price[rng.random(n) < 0.001] = 5000
+    df = pd.DataFrame({'size': size, 'bedrooms': bedrooms, 'age': age, 'price': price})
+    return pd.concat([df, df.iloc[:n // 50]], ignore_index=True)
+
+
+def medir(funcion, df):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y = funcion(df)
+    segundos = time.perf_counter() - t0
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return segundos, pico, X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de preparar_datos()')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    df = datos_sinteticos(args.rows)
+    print(f"DataFrame de entrada: {len(df)} filas, {df.memory_usage().sum() / 1e6:.0f} MB")
+
+    resultados = {}
+    for nombre, funcion in [('pandas', preparar_pandas), ('bloque', preparar_datos)]:
+        segundos, pico, X, y = medir(funcion, df)
+        resultados[nombre] = (X.to_numpy(dtype=np.float64), y.to_numpy(dtype=np.float64))
+        print(f"{nombre:<8} {segundos:8.2f} s   pico {pico / 1e6:8.0f} MB   {len(X)} filas")
+        del X, y
+
+    iguales = all(np.array_equal(a, b) for a, b in zip(resultados['pandas'], resultados['bloque']))
+    print(f"Resultados idénticos: {iguales}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Presupuesto de tiempo de importación del punto de entrada de serving
+
+Ejecuta `python -X importtime -c "import main"` en un proceso limpio, suma el
+tiempo acumulado de los módulos de primer nivel y falla (código de salida 1)
+si supera el presupuesto o si se importa algún módulo pesado o de
+entrenamiento. Con --warm-up también carga y precalienta el modelo y
+comprueba que sklearn sigue sin importarse.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.import_budget --budget-ms 400
+    SERVING_MODE=wsgi python -m benchmarks.import_budget --budget-ms 800
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Módulos que el arranque del servidor no debe importar
+PROHIBIDOS = (
+    'pandas', 'matplotlib', 'seaborn', 'sklearn', 'scipy', 'joblib',
+    'crispdm_inmuebles', 'entrenamiento_streaming', 'cache_datos',
+)
+
+CODIGO_WARM_UP = '''
+import sys, main, service
+service.warm_up()
+print("PROHIBIDOS=" + ",".join(sorted({{m.split(".")[0] for m in sys.modules}} & {prohibidos!r})))
+'''
+
+
+def medir(codigo):
+    """(ms de primer nivel, {módulo: ms acumulados}, stdout) de un proceso nuevo"""
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo],
+                             capture_output=True, text=True, env=os.environ)
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr[-2000:])
+    total = 0
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        modulos[nombre.strip()] = int(acumulado) / 1000
+        if not nombre.startswith('  '):
+            total += int(acumulado) / 1000
+    return total, modulos, proceso.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Presupuesto de importación de main:app')
+    parser.add_argument('--budget-ms', type=float, default=400)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Repeticiones; se toma la más rápida (default: 3)')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--warm-up', action='store_true',
+                        help='Cargar y precalentar el modelo (requiere artefactos)')
+    args = parser.parse_args()
+
+    total, modulos, _ = min((medir('import main') for _ in range(args.repeat)),
+                            key=lambda r: r[0])
+    print(f"SERVING_MODE={os.environ.get('SERVING_MODE', 'asgi')}: "
+          f"import main en {total:.1f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    for nombre, ms in sorted(modulos.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"   {ms:8.1f} ms  {nombre}")
+
+    errores = []
+    if total > args.budget_ms:
+        errores.append(f"import main tarda {total:.1f} ms > {args.budget_ms:.0f} ms")
+    prohibidos = sorted({m.split('.')[0] for m in modulos} & set(PROHIBIDOS))
+    if prohibidos:
+        errores.append(f"módulos prohibidos importados: {', '.join(prohibidos)}")
+
+    if args.warm_up:
+        _, _, salida = medir(CODIGO_WARM_UP.format(prohibidos=set(PROHIBIDOS)))
+        tras_warm_up = [l for l in salida.splitlines() if l.startswith('PROHIBIDOS=')][-1]
+        tras_warm_up = tras_warm_up[len('PROHIBIDOS='):]
+        if tras_warm_up:
+            errores.append(f"módulos prohibidos tras el warm-up: {tras_warm_up}")
+        else:
+            print("✅ Warm-up sin importar módulos prohibidos")
+
+    for error in errores:
+        print(f"❌ {error}")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Escalado del throughput con el número de workers (gunicorn + UvicornWorker)
+
+Arranca el servidor real con `gunicorn main:app -c uvicorn.conf.py` para cada
+número de workers, espera a /api/ready y lo carga con varios procesos cliente
+HTTP/1.1 keep-alive sobre localhost.
+
+Uso (desde la raíz del repositorio, con el modelo ya entrenado):
+    python -m benchmarks.load_workers --workers 1 2 4 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BODY = json.dumps({'size': 80, 'bedrooms': 3, 'age': 15}).encode()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_ready(port, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('El servidor no estuvo listo a tiempo')
+
+
+async def _conexion(port, path, fin, latencias):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    peticion = (f'POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(BODY)}\r\n\r\n').encode() + BODY
+    while time.monotonic() < fin:
+        t0 = time.perf_counter()
+        writer.write(peticion)
+        cabeceras = await reader.readuntil(b'\r\n\r\n')
+        longitud = 0
+        for linea in cabeceras.split(b'\r\n'):
+            if linea.lower().startswith(b'content-length:'):
+                longitud = int(linea.split(b':')[1])
+        await reader.readexactly(longitud)
+        latencias.append(time.perf_counter() - t0)
+    writer.close()
+
+
+def _cliente(args):
+    port, path, conexiones, segundos = args
+    latencias = []
+
+    async def correr():
+        fin = time.monotonic() + segundos
+        await asyncio.gather(*(_conexion(port, path, fin, latencias) for _ in range(conexiones)))
+
+    asyncio.run(correr())
+    return latencias
+
+
+def medir(workers, args):
+    port = _puerto_libre()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'main:app', '-c', 'uvicorn.conf.py',
+         '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _esperar_ready(port)
+        trabajos = [(port, args.path, args.connections, args.seconds)] * args.clients
+        with multiprocessing.Pool(args.clients) as pool:
+            latencias = sorted(l for parte in pool.map(_cliente, trabajos) for l in parte)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1000
+
+    return {
+        'workers': workers,
+        'requests': len(latencias),
+        'rps': round(len(latencias) / args.seconds, 1),
+        'p50_ms': round(percentil(50), 3),
+        'p99_ms': round(percentil(99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput por número de workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Procesos cliente generando carga')
+    parser.add_argument('--connections', type=int, default=16,
+                        help='Conexiones keep-alive por proceso cliente')
+    parser.add_argument('--path', default='/api/predict')
+    args = parser.parse_args()
+
+    base = None
+    for n in args.workers:
+        r = medir(n, args)
+        base = base or r['rps']
+        print(f"workers={n:<3} {r['rps']:>10.1f} req/s   x{r['rps'] / base:.2f}   "
+              f"p50 {r['p50_ms']:.3f} ms   p99 {r['p99_ms']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Paridad del entrenamiento en streaming entre 1 y N procesos
+
+Genera un CSV sintético con más filas que la muestra de medianas (valores
+faltantes, duplicados y precios fuera de rango), entrena con jobs=1 y
+jobs=N y falla (código de salida 1) si cambian las medianas, los conteos,
+la partición train/test o los coeficientes (más allá del redondeo de
+sumar en otro orden).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.paridad_streaming --rows 250000 --jobs 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from entrenamiento_streaming import entrenar_streaming
+
+
+def csv_sintetico(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'size': rng.integers(40, 121, n).astype(np.float64),
+        'bedrooms': rng.integers(1, 6, n).astype(np.float64),
+        'age': rng.integers(1, 36, n).astype(np.float64),
+    })
+    df['price'] = (50 + 2.5 * df['size'] + 10 * df['bedrooms'] - 1.5 * df['age']
+                   + rng.normal(0, 10, n)).round(2)
+    for col in df.columns:
+        df.loc[rng.random(n) < 0.03, col] = np.nan
+    df.loc[rng.random(n) < 0.01, 'price'] = 5000
+    # ~10% de filas repetidas, repartidas por todo el fichero
+    df = pd.concat([df, df.sample(frac=0.1, random_state=seed)]).sample(frac=1, random_state=seed)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def entrenar(path, chunksize, jobs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return entrenar_streaming(path, chunksize, jobs=jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridad del streaming entre 1 y N procesos')
+    parser.add_argument('--rows', type=int, default=250000,
+                        help='Filas del CSV (más que la muestra de medianas, 100000)')
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--chunksize', type=int, default=20000)
+    parser.add_argument('--rtol', type=float, default=1e-9,
+                        help='Tolerancia relativa de los coeficientes (default: 1e-9)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        path = os.path.join(directorio, 'paridad.csv')
+        filas = csv_sintetico(path, args.rows)
+        print(f"CSV sintético: {filas} filas; jobs=1 frente a jobs={args.jobs}")
+        a = entrenar(path, args.chunksize, 1)
+        b = entrenar(path, args.chunksize, args.jobs)
+
+    errores = []
+    if not np.array_equal(a['medianas'], b['medianas']):
+        errores.append(f"medianas distintas: {a['medianas']} vs {b['medianas']}")
+    if a['conteo'] != b['conteo']:
+        errores.append(f"conteos distintos: {a['conteo']} vs {b['conteo']}")
+    for clave in ('estadisticos', 'estadisticos_prueba'):
+        if a[clave].n != b[clave].n:
+            errores.append(f"partición distinta ({clave}): {a[clave].n} vs {b[clave].n}")
+    coef_a = np.append(a['estadisticos'].coeficientes()[0], a['estadisticos'].coeficientes()[1])
+    coef_b = np.append(b['estadisticos'].coeficientes()[0], b['estadisticos'].coeficientes()[1])
+    diferencia = np.max(np.abs(coef_a - coef_b) / np.maximum(np.abs(coef_a), 1e-12))
+    print(f"   • medianas: {a['medianas']}")
+    print(f"   • conteo: {a['conteo']}")
+    print(f"   • coeficientes (pesos, intercepto): {coef_a}")
+    print(f"   • diferencia relativa máxima de coeficientes: {diferencia:.2e}")
+    if diferencia > args.rtol:
+        errores.append(f"coeficientes distintos: {diferencia:.2e} > {args.rtol:.0e}")
+
+    for error in errores:
+        print(f"❌ {error}")
+    if not errores:
+        print("✅ Mismo resultado con 1 y con N procesos")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Suite de benchmarks reproducible del servicio de predicción
+
+Micro-benchmarks de predict_price(), las respuestas de la API y
+crispdm_inmuebles.predecir_precio(), y carga en proceso sobre `main:app`
+(sin red) a varias concurrencias con RPS y percentiles p50/p95/p99. Los
+resultados se guardan en JSON junto con el commit y el entorno para poder
+comparar dos ejecuciones.
+
+Uso (desde la raíz del repositorio, con el modelo ya entrenado):
+    python -m benchmarks.suite --concurrency 1 16 64 --output resultados.json
+    python -m benchmarks.suite --compare base.json resultados.json --tolerance 10
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from benchmarks.asgi_client import load, startup
+
+LOTE = {'size': [40 + i % 81 for i in range(100)],
+        'bedrooms': [1 + i % 5 for i in range(100)],
+        'age': [1 + i % 35 for i in range(100)]}
+
+CASOS = [
+    ('POST', '/api/predict', {'size': 80, 'bedrooms': 3, 'age': 15}),
+    ('POST', '/api/predict/batch', LOTE),
+    ('GET', '/api/health', b''),
+    ('GET', '/', b''),
+]
+
+
+def _commit():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def entorno():
+    import numpy as np
+    return {
+        'commit': _commit(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'serving_mode': os.environ.get('SERVING_MODE', 'asgi'),
+    }
+
+
+def _us_por_llamada(func, numero, repeticiones):
+    # El mínimo de varias repeticiones es el valor menos afectado por ruido
+    return min(timeit.repeat(func, number=numero, repeat=repeticiones)) / numero * 1e6
+
+
+def micro(artifacts, repeticiones=5):
+    """µs por llamada de las rutas de predicción sin HTTP"""
+    import service
+    from crispdm_inmuebles import obtener_predictor, predecir_precio
+
+    if service.current_handle() is None:
+        raise RuntimeError("Modelo no disponible: entrene primero el modelo")
+    resultados = {}
+
+    # La caché está desactivada por defecto: se mide con y sin ella
+    maxsize = service.prediction_cache.maxsize
+    try:
+        service.prediction_cache.maxsize = 4096
+        resultados['predict_price (acierto de caché)'] = _us_por_llamada(
+            lambda: service.predict_price(80, 3, 15), 20000, repeticiones)
+        service.prediction_cache.maxsize = 0
+        resultados['predict_price (sin caché)'] = _us_por_llamada(
+            lambda: service.predict_price(80, 3, 15), 20000, repeticiones)
+    finally:
+        service.prediction_cache.maxsize = maxsize
+    datos = {'size': 80, 'bedrooms': 3, 'age': 15}
+    resultados['api_predict_response'] = _us_por_llamada(
+        lambda: service.api_predict_response(datos), 20000, repeticiones)
+    resultados['api_batch_response (100 filas)'] = _us_por_llamada(
+        lambda: service.api_batch_response(LOTE), 500, repeticiones)
+
+    obtener_predictor(artifacts)
+    resultados['predecir_precio'] = _us_por_llamada(
+        lambda: predecir_precio(80, 3, 15, artifacts), 20000, repeticiones)
+    return {nombre: round(us, 3) for nombre, us in resultados.items()}
+
+
+async def _carga(app, concurrencias, peticiones, repeticiones):
+    lifespan = await startup(app)
+    resultados = []
+    for method, path, body in CASOS:
+        for concurrencia in concurrencias:
+            # Calentamiento y después la mediana (por RPS) de varias repeticiones
+            await load(app, method, path, body, concurrencia, concurrencia * 4)
+            corridas = []
+            for _ in range(repeticiones):
+                gc.collect()
+                corridas.append(await load(app, method, path, body, concurrencia, peticiones))
+            corridas.sort(key=lambda r: r['rps'])
+            r = corridas[len(corridas) // 2]
+            resultados.append({'method': method, 'path': path, **r})
+            print(f"   • {method:<5} {path:<20} c={concurrencia:<4} {r['rps']:>10.1f} req/s   "
+                  f"p50 {r['p50_ms']:.3f}   p95 {r['p95_ms']:.3f}   p99 {r['p99_ms']:.3f} ms")
+    lifespan.cancel()
+    return resultados
+
+
+def carga(concurrencias, peticiones, repeticiones=3):
+    """RPS y latencias de `main:app` en proceso, sin red"""
+    from main import app
+    return asyncio.run(_carga(app, concurrencias, peticiones, repeticiones))
+
+
+def _metricas_planas(resultado):
+    """{nombre: (valor, True si mayor es mejor)}"""
+    planas = {f"micro {nombre} (µs)": (us, False)
+              for nombre, us in resultado.get('micro', {}).items()}
+    for r in resultado.get('carga', []):
+        caso = f"{r['method']} {r['path']} c={r['concurrency']}"
+        planas[f"{caso} rps"] = (r['rps'], True)
+        for p in ('p50_ms', 'p99_ms'):
+            planas[f"{caso} {p}"] = (r[p], False)
+    return planas
+
+
+def comparar(base, nuevo, tolerancia):
+    """Imprimir las diferencias; devuelve el número de regresiones"""
+    print(f"Base: {base['entorno'].get('commit')}   Nuevo: {nuevo['entorno'].get('commit')}")
+    for clave in ('python', 'numpy', 'plataforma', 'cpus', 'serving_mode'):
+        if base['entorno'].get(clave) != nuevo['entorno'].get(clave):
+            print(f"⚠️  Entornos distintos ({clave}): {base['entorno'].get(clave)} → "
+                  f"{nuevo['entorno'].get(clave)}")
+    if base.get('parametros') != nuevo.get('parametros'):
+        print("⚠️  Parámetros distintos: las cifras de carga no son comparables")
+    a, b = _metricas_planas(base), _metricas_planas(nuevo)
+    regresiones = 0
+    for nombre in [n for n in a if n in b]:
+        (va, mayor_mejor), (vb, _) = a[nombre], b[nombre]
+        cambio = (vb - va) / va * 100 if va else 0.0
+        peor = -cambio if mayor_mejor else cambio
+        marca = ''
+        if peor > tolerancia:
+            marca = '  ❌ regresión'
+            regresiones += 1
+        elif peor < -tolerancia:
+            marca = '  ✅ mejora'
+        print(f"   {nombre:<50} {va:>12.3f} → {vb:>12.3f}  {cambio:+7.1f}%{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suite de benchmarks del servicio')
+    parser.add_argument('--artifacts', default='./artifacts')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Peticiones por caso y concurrencia (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Repeticiones por caso; se guarda la mediana (default: 3)')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--output', default=None,
+                        help='Fichero JSON de resultados (default: benchmarks/resultados/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NUEVO'),
+                        help='Comparar dos ficheros de resultados en lugar de medir')
+    parser.add_argument('--tolerance', type=float, default=10,
+                        help='Cambio en %% a partir del cual se marca una regresión (default: 10)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            nuevo = json.load(f)
+        regresiones = comparar(base, nuevo, args.tolerance)
+        if regresiones:
+            print(f"❌ {regresiones} métricas empeoran más de un {args.tolerance:.0f}%")
+        return 1 if regresiones else 0
+
+    resultado = {
+        'entorno': entorno(),
+        'parametros': {'concurrency': args.concurrency, 'requests': args.requests,
+                       'repeat': args.repeat},
+    }
+    if not args.skip_load:
+        print("Carga en proceso sobre main:app:")
+        resultado['carga'] = carga(args.concurrency, args.requests, args.repeat)
+    if not args.skip_micro:
+        print("Micro-benchmarks (µs por llamada):")
+        resultado['micro'] = micro(args.artifacts)
+        for nombre, us in resultado['micro'].items():
+            print(f"   • {nombre:<36} {us:9.3f}")
+
+    salida = args.output or os.path.join(
+        os.path.dirname(__file__), 'resultados', f"{resultado['entorno']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    print(f"📁 Resultados guardados en: {salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
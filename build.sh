@@ -11,4 +11,9 @@ pip install -r requirements.txt
 echo "🔧 Verificando Uvicorn..."
 python -c "import uvicorn; print(f'✅ Uvicorn {uvicorn.__version__} instalado')"
 
+# Presupuesto de arranque: falla si `import main` se vuelve lento o importa
+# módulos pesados o de entrenamiento (pandas, sklearn, matplotlib...)
+echo "⏱️  Verificando el tiempo de importación de main:app..."
+python -m benchmarks.import_budget --budget-ms "${IMPORT_BUDGET_MS:-400}" || exit 1
+
 echo "🎉 Build completado exitosamente!"
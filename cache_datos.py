@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Caché binaria del dataset preparado para entrenamientos repetidos
+Guarda las columnas limpias size/bedrooms/age/price de preparar_datos() en
+un .npy columnar (4, n) que las ejecuciones siguientes abren con mmap, sin
+volver a parsear el CSV
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import atomic_path, atomic_write_bytes
+
+FEATURES = ['size', 'bedrooms', 'age']
+COLUMNAS = FEATURES + ['price']
+
+# Se incrementa si cambia el formato de la caché; los cambios en la
+# limpieza los detecta la huella del código (huella_codigo)
+VERSION_CACHE = 3
+
+
+def hash_fichero(path, bloque=1 << 20):
+    """blake2b del contenido del fichero"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for parte in iter(lambda: f.read(bloque), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def huella_codigo(*objetos):
+    """
+    blake2b del código fuente de `objetos` (funciones o módulos): cambia si
+    se modifica el código que produce los datos cacheados
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for objeto in objetos:
+        h.update(inspect.getsource(objeto).encode())
+    return h.hexdigest()
+
+
+def rutas_cache(path, cache_dir):
+    """(datos .npy, metadatos .json) de la caché de `path`"""
+    nombre = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+    base = os.path.join(cache_dir, f'datos_{nombre}')
+    return base + '.npy', base + '.json'
+
+
+def cargar_cache(path, cache_dir, huella=None):
+    """
+    (X, y) desde la caché si sigue siendo válida para `path`, si no None
+
+    Si tamaño y mtime coinciden se usa sin más; si no, se compara el hash
+    del contenido (p. ej. el fichero se copió o se tocó sin cambiarlo).
+    La caché también se descarta si `huella` (la del código de
+    preparación, ver huella_codigo) no coincide con la guardada.
+    """
+    ruta_datos, ruta_meta = rutas_cache(path, cache_dir)
+    try:
+        with open(ruta_meta) as f:
+            meta = json.load(f)
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != VERSION_CACHE or meta.get('size') != st.st_size:
+        return None
+    if meta.get('huella') != huella:
+        return None
+    if meta.get('mtime_ns') != st.st_mtime_ns:
+        if meta.get('hash') != hash_fichero(path):
+            return None
+        meta['mtime_ns'] = st.st_mtime_ns
+        atomic_write_bytes(json.dumps(meta, indent=2).encode(), ruta_meta)
+
+    try:
+        datos = np.load(ruta_datos, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if datos.shape != (len(COLUMNAS), meta.get('filas')):
+        return None
+    # datos[:3].T es una vista (n, 3) sobre el mmap, sin copiar
+    X = pd.DataFrame(datos[:3].T, columns=FEATURES, copy=False)
+    y = pd.Series(datos[3], name='price', copy=False)
+    return X, y
+
+
+def guardar_cache(path, cache_dir, X, y, huella=None):
+    """Guardar (X, y) ya preparados como caché de `path` con la huella del código"""
+    ruta_datos, ruta_meta = rutas_cache(path, cache_dir)
+    st = os.stat(path)
+    datos = np.vstack([X[FEATURES].to_numpy(dtype=np.float64).T,
+                       y.to_numpy(dtype=np.float64)])
+    with atomic_path(ruta_datos) as tmp:
+        with open(tmp, 'wb') as f:
+            np.save(f, datos)
+    meta = {
+        'version': VERSION_CACHE,
+        'source': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'hash': hash_fichero(path),
+        'filas': int(datos.shape[1]),
+        'huella': huella,
+    }
+    atomic_write_bytes(json.dumps(meta, indent=2).encode(), ruta_meta)
+    return ruta_datos
@@ -10,22 +10,120 @@ Fecha: 2024
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.preprocessing import StandardScaler
 import joblib
 import argparse
+import json
+import os
+import time
 from pathlib import Path
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 warnings.filterwarnings('ignore')
 
-# Configuración de matplotlib
-plt.style.use('seaborn-v0_8')
-plt.rcParams['figure.figsize'] = (10, 6)
-plt.rcParams['font.size'] = 10
+from artifact_store import (
+    MANIFEST_FILENAME, artifact_hash, atomic_dump, atomic_write_bytes, file_lock,
+    new_version_dir, publish_version, resolve_artifacts_dir,
+)
+from estadisticos import (
+    ESTADISTICOS_FILENAME, EstadisticosSuficientes, cargar_estadisticos, guardar_estadisticos,
+    limpiar_bloque, primeras_apariciones,
+)
+from inference import (
+    FEATURES, FUSED_FILENAME, INTERVALS_FILENAME, METADATA_FILENAME, RANGOS, TABLE_FILENAME,
+    FusedLinearModel, PredictionIntervals, build_lookup_table, check_parity, save_lookup_table,
+)
+
+# Máximo de puntos por gráfico de dispersión: el coste de dibujar no crece con los datos
+MAX_PUNTOS_GRAFICO = 50_000
+
+@lru_cache(maxsize=None)
+def _pyplot():
+    """
+    Importar y configurar matplotlib solo cuando se genera un gráfico
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    # Configuración de matplotlib
+    plt.style.use('seaborn-v0_8')
+    plt.rcParams['figure.figsize'] = (10, 6)
+    plt.rcParams['font.size'] = 10
+    return plt
+
+def muestra_indices(n, k=MAX_PUNTOS_GRAFICO, seed=42):
+    """
+    Índices ordenados de una muestra uniforme de k de n filas (None si n <= k)
+    """
+    if n <= k:
+        return None
+    return np.sort(np.random.default_rng(seed).choice(n, k, replace=False))
+
+def muestra_filas(*datos, k=MAX_PUNTOS_GRAFICO):
+    """
+    Submuestra común de DataFrames/Series/arrays alineados para graficar
+    """
+    idx = muestra_indices(len(datos[0]), k)
+    if idx is None:
+        return datos
+    return tuple(d.iloc[idx] if hasattr(d, 'iloc') else np.asarray(d)[idx] for d in datos)
+
+class Graficador:
+    """
+    Decide cómo se generan los gráficos: en línea, en segundo plano o nunca
+    
+    Con `procesos > 0` los gráficos se encolan y se renderizan en un pool de
+    procesos lanzado con lanzar() (tras guardar el modelo).
+    """
+    
+    def __init__(self, activo=True, dpi=300, procesos=0):
+        self.activo = activo
+        self.dpi = dpi
+        self.procesos = procesos
+        self._pendientes = []
+        self._futuros = []
+        self._pool = None
+    
+    def __call__(self, funcion, *args, **kwargs):
+        if not self.activo:
+            return
+        kwargs['dpi'] = self.dpi
+        if self.procesos:
+            self._pendientes.append((funcion, args, kwargs))
+        else:
+            funcion(*args, **kwargs)
+    
+    def lanzar(self):
+        """Empezar a renderizar en segundo plano los gráficos encolados"""
+        if not self._pendientes:
+            return
+        print(f"\n🖼️  Renderizando {len(self._pendientes)} grupos de gráficos en "
+              f"{self.procesos} procesos en segundo plano...")
+        self._pool = ProcessPoolExecutor(self.procesos)
+        self._futuros = [self._pool.submit(f, *a, **kw) for f, a, kw in self._pendientes]
+        self._pendientes = []
+    
+    def esperar(self):
+        """Esperar a los gráficos en segundo plano"""
+        self.lanzar()
+        if self._pool is None:
+            return
+        try:
+            for futuro in self._futuros:
+                try:
+                    futuro.result()
+                except Exception as e:
+                    print(f"⚠️  Error generando gráficos: {e}")
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+        print("✅ Gráficos en segundo plano completados")
 
 def fase1_comprension_negocio():
     """
@@ -107,10 +205,26 @@ def explorar_datos(df):
     print(f"\n✅ Todas las columnas requeridas están presentes")
     return True
 
-def generar_graficos_exploratorios(df, artifacts_dir):
+def analizar_correlaciones(df):
+    """
+    Matriz de correlación y correlación de cada variable con el precio
+    """
+    correlacion = df[["size", "bedrooms", "age", "price"]].apply(pd.to_numeric, errors="coerce").corr()
+    print("\n📊 ANÁLISIS DE CORRELACIONES:")
+    print("Correlación con el precio:")
+    for col in ['size', 'bedrooms', 'age']:
+        print(f"   • {col}: {correlacion.loc[col, 'price']:.4f}")
+    return correlacion
+
+def generar_graficos_exploratorios(df, artifacts_dir, correlacion=None, dpi=300):
     """
     Generar y guardar gráficos exploratorios
+    Con muchas filas, conviene pasar una muestra (muestra_filas) y la
+    correlación calculada sobre el dataset completo
     """
+    plt = _pyplot()
+    import seaborn as sns
+    
     print("\n📈 Generando gráficos exploratorios...")
     
     # Crear directorio si no existe
@@ -145,7 +259,7 @@ def generar_graficos_exploratorios(df, artifacts_dir):
     axes[1, 1].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/histogramas.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/histogramas.png', dpi=dpi, bbox_inches='tight')
     print("✅ Histogramas guardados como 'histogramas.png'")
     plt.close()
     
@@ -172,73 +286,74 @@ def generar_graficos_exploratorios(df, artifacts_dir):
     axes[2].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/dispersiones.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/dispersiones.png', dpi=dpi, bbox_inches='tight')
     print("✅ Gráficos de dispersión guardados como 'dispersiones.png'")
     plt.close()
     
     # Matriz de correlación
-    correlacion = df.corr()
+    if correlacion is None:
+        correlacion = df.corr()
     plt.figure(figsize=(10, 8))
     sns.heatmap(correlacion, annot=True, cmap='coolwarm', center=0, 
                square=True, linewidths=0.5, fmt='.3f')
     plt.title('Matriz de Correlación', fontsize=16, fontweight='bold')
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/correlacion.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/correlacion.png', dpi=dpi, bbox_inches='tight')
     print("✅ Matriz de correlación guardada como 'correlacion.png'")
     plt.close()
-    
-    # Análisis de correlaciones
-    print("\n📊 ANÁLISIS DE CORRELACIONES:")
-    print("Correlación con el precio:")
-    for col in ['size', 'bedrooms', 'age']:
-        corr = df[col].corr(df['price'])
-        print(f"   • {col}: {corr:.4f}")
 
 def preparar_datos(df):
     """
     FASE 3: PREPARACIÓN DE LOS DATOS
+    Las cuatro columnas se convierten a un único bloque float64 contiguo
+    sobre el que se imputan, deduplican (por hash de fila, con todas las
+    columnas como drop_duplicates) y filtran, sin copias intermedias del
+    DataFrame
     """
     print("\n" + "="*80)
     print("FASE 3: PREPARACIÓN DE LOS DATOS")
     print("="*80)
     
-    df_limpio = df.copy()
-    print(f"📊 Dataset original: {df_limpio.shape[0]} filas, {df_limpio.shape[1]} columnas")
+    print(f"📊 Dataset original: {df.shape[0]} filas, {df.shape[1]} columnas")
+    columnas_numericas = ["size", "bedrooms", "age", "price"]
     
-    # 1. Convertir a numérico con coerce
+    # 1. Convertir a numérico con coerce, columna a columna sobre el bloque
     print("\n🔄 Convirtiendo columnas a numérico...")
-    columnas_numericas = ["size", "bedrooms", "age", "price"]
-    for col in columnas_numericas:
-        if col in df_limpio.columns:
-            df_limpio[col] = pd.to_numeric(df_limpio[col], errors="coerce")
-            print(f"   • {col}: convertido a numérico")
+    bloque = np.empty((len(df), len(columnas_numericas)), dtype=np.float64, order='F')
+    for i, col in enumerate(columnas_numericas):
+        bloque[:, i] = pd.to_numeric(df[col], errors="coerce")
+        print(f"   • {col}: convertido a numérico")
+    print(f"   • Bloque float64: {bloque.nbytes / 1e6:.1f} MB")
     
     # 2. Rellenar valores faltantes con mediana
     print("\n🔧 Rellenando valores faltantes...")
-    for col in columnas_numericas:
-        if col in df_limpio.columns:
-            mediana = df_limpio[col].median()
-            df_limpio[col].fillna(mediana, inplace=True)
-            print(f"   • {col}: valores faltantes rellenados con mediana ({mediana:.2f})")
+    medianas = np.array([np.nanmedian(bloque[:, i]) for i in range(bloque.shape[1])])
+    for col, mediana in zip(columnas_numericas, medianas):
+        print(f"   • {col}: valores faltantes rellenados con mediana ({mediana:.2f})")
+    en_rango = limpiar_bloque(bloque, medianas)
     
-    # 3. Eliminar duplicados
+    # 3. Eliminar duplicados: una fila solo es duplicada si coinciden todas
+    # sus columnas; las demás se comparan por su código de factorize
     print("\n🔍 Eliminando duplicados...")
-    filas_antes = len(df_limpio)
-    df_limpio.drop_duplicates(inplace=True)
-    filas_despues = len(df_limpio)
-    print(f"   • Duplicados eliminados: {filas_antes - filas_despues}")
+    otras = [col for col in df.columns if col not in columnas_numericas]
+    if otras:
+        codigos = np.column_stack([pd.factorize(df[col])[0] for col in otras])
+        unicas = primeras_apariciones(np.hstack([bloque, codigos.astype(np.float64)]))
+    else:
+        unicas = primeras_apariciones(bloque)
+    print(f"   • Duplicados eliminados: {len(bloque) - int(unicas.sum())}")
     
     # 4. Filtrar precios fuera de rango
     print("\n📊 Filtrando precios fuera de rango...")
-    filas_antes = len(df_limpio)
-    df_limpio = df_limpio[(df_limpio["price"] > 0) & (df_limpio["price"] < 1000)]
-    filas_despues = len(df_limpio)
-    print(f"   • Filas eliminadas por precio fuera de rango: {filas_antes - filas_despues}")
+    print(f"   • Filas eliminadas por precio fuera de rango: {int((unicas & ~en_rango).sum())}")
+    conservar = unicas & en_rango
+    bloque = bloque[conservar]
     
     # 5. Separar X e y
     print("\n✂️  Separando variables predictoras y objetivo...")
-    X = df_limpio[["size", "bedrooms", "age"]]
-    y = df_limpio["price"]
+    indice = df.index[conservar]
+    X = pd.DataFrame(bloque[:, :3], columns=columnas_numericas[:3], index=indice, copy=False)
+    y = pd.Series(bloque[:, 3], name="price", index=indice, copy=False)
     
     print(f"   • X shape: {X.shape}")
     print(f"   • y shape: {y.shape}")
@@ -311,10 +426,12 @@ def entrenar_modelo(X_train, y_train):
     
     return modelo, coef_df
 
-def generar_grafico_coeficientes(coef_df, artifacts_dir):
+def generar_grafico_coeficientes(coef_df, artifacts_dir, dpi=300):
     """
     Generar gráfico de coeficientes
     """
+    plt = _pyplot()
+    
     plt.figure(figsize=(10, 6))
     plt.bar(coef_df['Variable'], coef_df['Coeficiente'], 
            color=['skyblue', 'lightgreen', 'salmon'])
@@ -330,13 +447,20 @@ def generar_grafico_coeficientes(coef_df, artifacts_dir):
                 ha='center', va='bottom' if v >= 0 else 'top', fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/coeficientes.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/coeficientes.png', dpi=dpi, bbox_inches='tight')
     print("✅ Gráfico de coeficientes guardado como 'coeficientes.png'")
     plt.close()
 
-def evaluar_modelo(modelo, X_train, X_test, y_train, y_test, artifacts_dir):
+def evaluar_modelo(modelo, X_train, X_test, y_train, y_test, artifacts_dir, graficar=None,
+                   X=None, y=None, pliegues=5, replicas=1000, detalle=False):
     """
     FASE 5: EVALUACIÓN
+    Con X e y (todos los datos preparados) añade validación cruzada de
+    `pliegues` pliegues y leave-one-out; con `replicas` > 0, intervalos de
+    confianza bootstrap de las métricas de prueba
+    
+    Devuelve (r2_test, rmse_test, mae_test); con `detalle=True`, todas las
+    métricas ({'r2_train', 'r2_test', 'rmse_train', ...})
     """
     print("\n" + "="*80)
     print("FASE 5: EVALUACIÓN")
@@ -347,13 +471,36 @@ def evaluar_modelo(modelo, X_train, X_test, y_train, y_test, artifacts_dir):
     y_pred_test = modelo.predict(X_test)
     
     # Calcular métricas
-    r2_train = r2_score(y_train, y_pred_train)
-    r2_test = r2_score(y_test, y_pred_test)
-    rmse_train = np.sqrt(mean_squared_error(y_train, y_pred_train))
-    rmse_test = np.sqrt(mean_squared_error(y_test, y_pred_test))
-    mae_train = mean_absolute_error(y_train, y_pred_train)
-    mae_test = mean_absolute_error(y_test, y_pred_test)
+    metricas = calcular_metricas(y_train, y_pred_train, y_test, y_pred_test)
+    r2_test, rmse_test, mae_test = metricas['r2_test'], metricas['rmse_test'], metricas['mae_test']
+    
+    mostrar_metricas(metricas['r2_train'], r2_test, metricas['rmse_train'], rmse_test,
+                     metricas['mae_train'], mae_test)
+    mostrar_validacion(X, y, y_test, y_pred_test, pliegues, replicas)
+    
+    # Generar gráficos de evaluación (sobre una muestra si hay muchas filas)
+    graficar = graficar or Graficador()
+    graficar(generar_graficos_evaluacion, *muestra_filas(y_test, y_pred_test), artifacts_dir,
+             r2=r2_test)
     
+    return metricas if detalle else (r2_test, rmse_test, mae_test)
+
+def calcular_metricas(y_train, y_pred_train, y_test, y_pred_test):
+    """
+    Métricas de train y prueba ({'r2_train', 'r2_test', 'rmse_train', ...})
+    """
+    return {
+        'r2_train': r2_score(y_train, y_pred_train), 'r2_test': r2_score(y_test, y_pred_test),
+        'rmse_train': np.sqrt(mean_squared_error(y_train, y_pred_train)),
+        'rmse_test': np.sqrt(mean_squared_error(y_test, y_pred_test)),
+        'mae_train': mean_absolute_error(y_train, y_pred_train),
+        'mae_test': mean_absolute_error(y_test, y_pred_test),
+    }
+
+def mostrar_metricas(r2_train, r2_test, rmse_train, rmse_test, mae_train, mae_test):
+    """
+    Imprimir métricas de evaluación y su interpretación
+    """
     print("📊 MÉTRICAS DE EVALUACIÓN:")
     print(f"   • R² (Entrenamiento): {r2_train:.4f}")
     print(f"   • R² (Prueba): {r2_test:.4f}")
@@ -375,16 +522,43 @@ def evaluar_modelo(modelo, X_train, X_test, y_train, y_test, artifacts_dir):
         print("   ✅ Rendimiento aceptable del modelo")
     else:
         print("   ⚠️  El modelo podría necesitar mejoras")
+
+def mostrar_validacion(X, y, y_test, y_pred_test, pliegues=5, replicas=1000):
+    """
+    Validación cruzada, leave-one-out e intervalos bootstrap, calculados a
+    partir de estadísticos suficientes y residuos (sin reajustar el modelo)
+    """
+    from validacion import (
+        MIN_FILAS_BOOTSTRAP, intervalos_bootstrap, leave_one_out, validacion_cruzada,
+    )
     
-    # Generar gráficos de evaluación
-    generar_graficos_evaluacion(y_test, y_pred_test, artifacts_dir)
-    
-    return r2_test, rmse_test, mae_test
+    if X is not None and pliegues and len(y) >= max(pliegues, 2):
+        print(f"\n🔁 VALIDACIÓN CRUZADA ({pliegues} pliegues):")
+        cv = validacion_cruzada(X, y, pliegues)
+        media, desviacion = np.nanmean(cv, axis=0), np.nanstd(cv, axis=0)
+        print(f"   • R²: {media[0]:.4f} ± {desviacion[0]:.4f}")
+        print(f"   • RMSE: {media[1]:.2f} ± {desviacion[1]:.2f}")
+        print(f"   • MAE: {media[2]:.2f} ± {desviacion[2]:.2f}")
+        r2, rmse, mae = leave_one_out(X, y)
+        print(f"   • Leave-one-out: R² {r2:.4f} | RMSE {rmse:.2f} | MAE {mae:.2f}")
+    
+    if replicas and len(y_test) < MIN_FILAS_BOOTSTRAP:
+        print(f"\n⚠️  Intervalos bootstrap omitidos: el conjunto de prueba tiene {len(y_test)} filas "
+              f"(mínimo {MIN_FILAS_BOOTSTRAP})")
+    elif replicas:
+        print(f"\n📏 INTERVALOS DE CONFIANZA 95% (bootstrap, {replicas} réplicas, prueba):")
+        intervalos = intervalos_bootstrap(y_test, np.asarray(y_test) - y_pred_test, replicas)
+        print(f"   • R²: [{intervalos['r2'][0]:.4f}, {intervalos['r2'][1]:.4f}]")
+        print(f"   • RMSE: [{intervalos['rmse'][0]:.2f}, {intervalos['rmse'][1]:.2f}]")
+        print(f"   • MAE: [{intervalos['mae'][0]:.2f}, {intervalos['mae'][1]:.2f}]")
 
-def generar_graficos_evaluacion(y_test, y_pred_test, artifacts_dir):
+def generar_graficos_evaluacion(y_test, y_pred_test, artifacts_dir, r2=None, dpi=300):
     """
     Generar gráficos de evaluación
+    `r2` permite rotular con el R² del conjunto completo al graficar una muestra
     """
+    plt = _pyplot()
+    
     print("\n📈 Generando gráficos de evaluación...")
     
     # Predicciones vs Valores reales
@@ -397,12 +571,13 @@ def generar_graficos_evaluacion(y_test, y_pred_test, artifacts_dir):
     plt.grid(True, alpha=0.3)
     
     # Agregar R² en el gráfico
-    r2 = r2_score(y_test, y_pred_test)
+    if r2 is None:
+        r2 = r2_score(y_test, y_pred_test)
     plt.text(0.05, 0.95, f'R² = {r2:.4f}', transform=plt.gca().transAxes, 
              bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
     
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/pred_vs_real.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/pred_vs_real.png', dpi=dpi, bbox_inches='tight')
     print("✅ Gráfico predicciones vs reales guardado como 'pred_vs_real.png'")
     plt.close()
     
@@ -428,13 +603,24 @@ def generar_graficos_evaluacion(y_test, y_pred_test, artifacts_dir):
     axes[1].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(f'{artifacts_dir}/residuos.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'{artifacts_dir}/residuos.png', dpi=dpi, bbox_inches='tight')
     print("✅ Gráficos de residuos guardados como 'residuos.png'")
     plt.close()
 
-def guardar_modelo(modelo, scaler, artifacts_dir):
+def guardar_modelo(modelo, scaler, artifacts_dir, estadisticos=None, metricas=None, bloquear=True):
     """
     FASE 6: DESPLIEGUE - Guardar modelo y scaler
+    
+    Los artefactos se escriben en un directorio nuevo (artifacts/v<N>/) y
+    solo al final se publica el manifiesto que apunta a él: el servidor
+    carga la versión nueva sin reiniciarse y nunca ve una a medio escribir
+    
+    `estadisticos` = (train, test, medianas) se guardan con el modelo para
+    poder actualizarlo después con --incremental, y con ellos la varianza
+    residual y Cxx⁻¹ para servir intervalos de predicción; `metricas` (como
+    las devuelve evaluar_modelo con detalle=True) van a los metadatos que
+    sirve /api/info. `bloquear=False` si quien llama ya tiene el bloqueo
+    de `artifacts_dir`
     """
     print("\n" + "="*80)
     print("FASE 6: DESPLIEGUE")
@@ -442,45 +628,195 @@ def guardar_modelo(modelo, scaler, artifacts_dir):
     
     print("💾 Guardando modelo y scaler...")
     
-    # Guardar modelo
-    modelo_path = f'{artifacts_dir}/modelo.joblib'
-    joblib.dump(modelo, modelo_path)
-    print(f"   • Modelo guardado en: {modelo_path}")
-    
-    # Guardar scaler
-    scaler_path = f'{artifacts_dir}/scaler.joblib'
-    joblib.dump(scaler, scaler_path)
-    print(f"   • Scaler guardado en: {scaler_path}")
+    # Bloqueo exclusivo: dos entrenamientos no reservan la misma versión
+    with file_lock(artifacts_dir) if bloquear else nullcontext():
+        version_dir = new_version_dir(artifacts_dir)
+        
+        # Guardar modelo
+        modelo_path = f'{version_dir}/modelo.joblib'
+        atomic_dump(modelo, modelo_path)
+        print(f"   • Modelo guardado en: {modelo_path}")
+        
+        # Guardar scaler
+        scaler_path = f'{version_dir}/scaler.joblib'
+        atomic_dump(scaler, scaler_path)
+        print(f"   • Scaler guardado en: {scaler_path}")
+        
+        # Exportar modelo fusionado (scaler plegado en los coeficientes)
+        fusionado = FusedLinearModel.from_sklearn(modelo, scaler)
+        diferencia = check_parity(fusionado, modelo, scaler)
+        fusionado_path = f'{version_dir}/{FUSED_FILENAME}'
+        fusionado.save(fusionado_path)
+        print(f"   • Modelo fusionado guardado en: {fusionado_path} (paridad con sklearn: {diferencia:.2e})")
+        
+        # Exportar tabla de precios para las entradas enteras
+        exportar_tabla_precios(modelo, scaler, version_dir)
+        
+        if estadisticos is not None:
+            estadisticos_path = f'{version_dir}/{ESTADISTICOS_FILENAME}'
+            guardar_estadisticos(estadisticos_path, *estadisticos)
+            print(f"   • Estadísticos suficientes guardados en: {estadisticos_path}")
+            
+            train = estadisticos[0]
+            intervalos = PredictionIntervals.from_statistics(
+                train.n, train.media_x, train.cxx, train.sse(fusionado.pesos, fusionado.intercepto))
+            intervalos_path = f'{version_dir}/{INTERVALS_FILENAME}'
+            intervalos.save(intervalos_path)
+            print(f"   • Intervalos de predicción guardados en: {intervalos_path} "
+                  f"(σ residual: {intervalos.sigma2 ** 0.5:.2f})")
+        
+        # Metadatos ligados a esta versión por el hash de modelo y scaler
+        metadatos = metadatos_modelo(fusionado, artifact_hash([modelo_path, scaler_path]),
+                                     metricas, estadisticos)
+        metadatos_path = f'{version_dir}/{METADATA_FILENAME}'
+        atomic_write_bytes(json.dumps(metadatos, indent=2, ensure_ascii=False).encode() + b'\n',
+                           metadatos_path)
+        print(f"   • Metadatos guardados en: {metadatos_path}")
+        
+        # Publicar la versión completa con un único rename del manifiesto
+        manifiesto = publish_version(artifacts_dir, version_dir)
+        print(f"   • Versión {manifiesto['version']} publicada en: {artifacts_dir}/{MANIFEST_FILENAME}")
     
     print("✅ Modelo y scaler guardados exitosamente!")
 
+def ecuacion_modelo(intercepto, pesos):
+    """Ecuación con los coeficientes en unidades originales (variables sin escalar)"""
+    ecuacion = f"Precio = {intercepto:.2f}"
+    for peso, col in zip(pesos, FEATURES):
+        ecuacion += f" {'+' if peso >= 0 else '-'} {abs(peso):.2f} × {col}"
+    return ecuacion
+
+def metadatos_modelo(fusionado, hash_artefactos, metricas=None, estadisticos=None):
+    """
+    Metadatos compactos de una versión del modelo para el servidor: métricas,
+    coeficientes (unidades originales), rangos válidos, filas y hash
+    """
+    metadatos = {
+        'artifact_hash': hash_artefactos,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'algorithm': 'LinearRegression',
+        'features': list(FEATURES),
+        'target': 'price',
+        'coefficients': {'intercept': round(fusionado.intercepto, 6),
+                         **{col: round(float(p), 6) for col, p in zip(FEATURES, fusionado.pesos)}},
+        'equation': ecuacion_modelo(fusionado.intercepto, fusionado.pesos),
+        'feature_ranges': {col: list(rango) for col, rango in RANGOS.items()},
+    }
+    if metricas:
+        metadatos['metrics'] = {
+            conjunto: {m: round(float(metricas[f'{m}_{conjunto}']), 4) for m in ('r2', 'rmse', 'mae')}
+            for conjunto in ('train', 'test')
+        }
+    if estadisticos is not None:
+        metadatos['training_rows'] = int(round(estadisticos[0].n))
+        metadatos['test_rows'] = int(round(estadisticos[1].n))
+    return metadatos
+
+def estadisticos_ajuste(X, y, X_train, X_test, y_train, y_test):
+    """
+    (train, test, medianas) del ajuste en memoria para --incremental; las
+    medianas de imputación se toman de los datos ya preparados
+    """
+    medianas = np.append(np.median(np.asarray(X, dtype=np.float64), axis=0), np.median(y))
+    return (EstadisticosSuficientes.desde_datos(X_train, y_train),
+            EstadisticosSuficientes.desde_datos(X_test, y_test), medianas)
+
+def exportar_tabla_precios(modelo, scaler, artifacts_dir):
+    """
+    Materializar la rejilla entera de entradas (tamaño × habitaciones × edad)
+    como una tabla float32 que el servidor mapea en memoria
+    """
+    tabla = build_lookup_table(modelo, scaler)
+    tabla_path = f'{artifacts_dir}/{TABLE_FILENAME}'
+    save_lookup_table(tabla, tabla_path)
+    print(f"   • Tabla de precios guardada en: {tabla_path} "
+          f"({'×'.join(map(str, tabla.shape))} celdas, {tabla.nbytes / 1024:.0f} KiB)")
+    return tabla
+
+class Predictor:
+    """
+    Modelo cargado una sola vez para predicciones individuales y por lotes
+    Usa el modelo fusionado: un producto escalar, sin sklearn por llamada
+    """
+    
+    def __init__(self, motor):
+        self.motor = motor
+    
+    @classmethod
+    def desde_modelo(cls, modelo, scaler):
+        """Predictor a partir del modelo y scaler ya entrenados en memoria"""
+        return cls(FusedLinearModel.from_sklearn(modelo, scaler))
+    
+    @classmethod
+    def cargar(cls, artifacts_dir="./artifacts"):
+        """Predictor a partir de los artefactos guardados (la versión publicada)"""
+        artifacts_dir = resolve_artifacts_dir(artifacts_dir)
+        fusionado_path = Path(artifacts_dir) / FUSED_FILENAME
+        modelo_path = Path(artifacts_dir) / 'modelo.joblib'
+        # Un artefacto fusionado más antiguo que el modelo está obsoleto
+        if fusionado_path.exists() and (not modelo_path.exists() or
+                                        fusionado_path.stat().st_mtime_ns >= modelo_path.stat().st_mtime_ns):
+            return cls(FusedLinearModel.load(fusionado_path))
+        modelo = joblib.load(modelo_path)
+        scaler = joblib.load(f'{artifacts_dir}/scaler.joblib')
+        return cls.desde_modelo(modelo, scaler)
+    
+    def predecir(self, tamaño, habitaciones, edad):
+        """Precio estimado de un inmueble (miles $)"""
+        return self.motor.predict_one(float(tamaño), float(habitaciones), float(edad))
+    
+    def predecir_lote(self, X):
+        """Precios estimados para una matriz/DataFrame (n, 3) de size, bedrooms, age"""
+        if hasattr(X, 'columns'):
+            X = X[["size", "bedrooms", "age"]]
+        return self.motor.predict(np.asarray(X, dtype=np.float64))
+
+# Predictores cargados por directorio de artefactos, con la firma de los ficheros
+_predictores = {}
+
+def _firma_artefactos(artifacts_dir):
+    # Las versiones publicadas no se modifican: basta con el manifiesto
+    try:
+        st = os.stat(os.path.join(artifacts_dir, MANIFEST_FILENAME))
+        return (MANIFEST_FILENAME, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        pass
+    firma = []
+    for nombre in (FUSED_FILENAME, 'modelo.joblib', 'scaler.joblib'):
+        try:
+            st = os.stat(os.path.join(artifacts_dir, nombre))
+            firma.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+def obtener_predictor(artifacts_dir="./artifacts"):
+    """
+    Predictor de `artifacts_dir`, cargado una vez por proceso y recargado
+    solo si los artefactos cambian en disco
+    """
+    clave = os.path.abspath(artifacts_dir)
+    firma = _firma_artefactos(artifacts_dir)
+    entrada = _predictores.get(clave)
+    if entrada is None or entrada[0] != firma:
+        entrada = (firma, Predictor.cargar(artifacts_dir))
+        _predictores[clave] = entrada
+    return entrada[1]
+
 def predecir_precio(tamaño, habitaciones, edad, artifacts_dir="./artifacts"):
     """
     Función para predecir el precio de un inmueble
     """
     try:
-        # Cargar modelo y scaler
-        modelo = joblib.load(f'{artifacts_dir}/modelo.joblib')
-        scaler = joblib.load(f'{artifacts_dir}/scaler.joblib')
-        
-        # Crear array con los datos
-        datos_nuevos = np.array([[tamaño, habitaciones, edad]])
-        
-        # Escalar los datos
-        datos_escalados = scaler.transform(datos_nuevos)
-        
-        # Hacer predicción
-        precio_predicho = modelo.predict(datos_escalados)[0]
-        
-        return precio_predicho
-        
+        return obtener_predictor(artifacts_dir).predecir(tamaño, habitaciones, edad)
     except Exception as e:
         print(f"❌ Error en la predicción: {e}")
         return None
 
-def mostrar_ejemplos_prediccion(artifacts_dir):
+def mostrar_ejemplos_prediccion(artifacts_dir, predictor=None):
     """
     Mostrar ejemplos de predicción
+    `predictor` permite reutilizar el modelo recién entrenado sin releerlo de disco
     """
     print("\n🔮 EJEMPLOS DE PREDICCIÓN:")
     ejemplos = [
@@ -490,10 +826,15 @@ def mostrar_ejemplos_prediccion(artifacts_dir):
         (100, 4, 10, "Casa grande y relativamente nueva")
     ]
     
-    for tam, hab, edad, desc in ejemplos:
-        precio_pred = predecir_precio(tam, hab, edad, artifacts_dir)
-        if precio_pred is not None:
-            print(f"   • {desc}: {tam}m², {hab} habitaciones, {edad} años → Precio estimado: ${precio_pred:.0f}k")
+    try:
+        predictor = predictor or obtener_predictor(artifacts_dir)
+    except Exception as e:
+        print(f"❌ Error en la predicción: {e}")
+        return
+    
+    precios = predictor.predecir_lote([fila[:3] for fila in ejemplos])
+    for (tam, hab, edad, desc), precio_pred in zip(ejemplos, precios):
+        print(f"   • {desc}: {tam}m², {hab} habitaciones, {edad} años → Precio estimado: ${precio_pred:.0f}k")
 
 def fase7_retroalimentacion():
     """
@@ -506,13 +847,167 @@ def fase7_retroalimentacion():
     print("🚀 PRÓXIMOS PASOS RECOMENDADOS:")
     print("   • Validar resultados con el equipo de negocio")
     print("   • Implementar monitoreo continuo del modelo")
-    print("   • Reentrenar el modelo periódicamente con nuevos datos")
+    print("   • Reentrenar el modelo periódicamente con nuevos datos (--incremental)")
     print("   • Probar otros algoritmos (Árboles de Decisión, Random Forest, XGBoost)")
     print("   • Considerar variables adicionales (ubicación, amenities, etc.)")
     print("   • Implementar validación cruzada para robustez")
     print("   • Crear dashboard para visualización de predicciones")
     print()
 
+def cargar_datos_preparados(path, cache_dir, artifacts_dir, graficar=None):
+    """
+    Fases 2 y 3 con caché: si `cache_dir` tiene el dataset ya preparado y
+    el CSV no ha cambiado, se abre con mmap en lugar de parsear el CSV.
+    La caché se invalida también si cambia el código de preparación
+    """
+    if cache_dir:
+        import estadisticos
+        from cache_datos import cargar_cache, huella_codigo
+        huella = huella_codigo(cargar_datos, preparar_datos, estadisticos)
+        datos = cargar_cache(path, cache_dir, huella)
+        if datos is not None:
+            X, y = datos
+            print("="*80)
+            print("FASES 2 Y 3: DATOS PREPARADOS DESDE CACHÉ")
+            print("="*80)
+            print(f"♻️  {path} no ha cambiado: {len(X)} filas limpias cargadas desde {cache_dir}")
+            print("ℹ️  Exploración y gráficos exploratorios omitidos (el CSV no se ha vuelto a leer);")
+            print("   usa --no-cache para regenerarlos")
+            return X, y
+    
+    # Fase 2: Comprensión de los datos
+    df = cargar_datos(path)
+    if df is None:
+        print("❌ No se pudieron cargar los datos. Terminando ejecución.")
+        return None
+    
+    if not explorar_datos(df):
+        print("❌ El dataset no contiene las columnas requeridas. Terminando ejecución.")
+        return None
+    
+    correlacion = analizar_correlaciones(df)
+    graficar = graficar or Graficador()
+    graficar(generar_graficos_exploratorios, *muestra_filas(df), artifacts_dir, correlacion)
+    
+    # Fase 3: Preparación de los datos
+    X, y = preparar_datos(df)
+    
+    if cache_dir:
+        from cache_datos import guardar_cache
+        try:
+            ruta = guardar_cache(path, cache_dir, X, y, huella)
+            print(f"💾 Dataset preparado guardado en caché: {ruta}")
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar la caché del dataset: {e}")
+    
+    return X, y
+
+def ejecutar_streaming(args):
+    """
+    Flujo CRISP-DM con entrenamiento en streaming (--chunksize / --jobs)
+    Sin gráficos: requerirían tener todos los datos en memoria
+    """
+    from entrenamiento_streaming import CHUNKSIZE, entrenar_streaming
+    
+    try:
+        fase1_comprension_negocio()
+        
+        if not Path(args.data).exists():
+            print(f"❌ Error: No se encontró el archivo {args.data}")
+            return 1
+        
+        # Fases 2-4: lectura por bloques, preparación y ajuste por estadísticos suficientes
+        resultado = entrenar_streaming(args.data, args.chunksize or CHUNKSIZE, jobs=args.jobs)
+        modelo, scaler = resultado['modelo'], resultado['scaler']
+        
+        # Fase 5: Evaluación
+        print("\n" + "="*80)
+        print("FASE 5: EVALUACIÓN")
+        print("="*80)
+        m = resultado['metricas']
+        mostrar_metricas(m['r2_train'], m['r2_test'], m['rmse_train'], m['rmse_test'],
+                         m['mae_train'], m['mae_test'])
+        
+        # Fase 6: Despliegue
+        guardar_modelo(modelo, scaler, args.artifacts,
+                       (resultado['estadisticos'], resultado['estadisticos_prueba'],
+                        resultado['medianas']), resultado['metricas'])
+        mostrar_ejemplos_prediccion(args.artifacts, Predictor.desde_modelo(modelo, scaler))
+        
+        # Fase 7: Retroalimentación
+        fase7_retroalimentacion()
+        
+        print("🎉 ¡PROYECTO COMPLETADO EXITOSAMENTE!")
+        print(f"📁 Artefactos guardados en: {args.artifacts}")
+        
+        return 0
+        
+    except Exception as e:
+        print(f"❌ Error durante la ejecución: {e}")
+        return 1
+
+def ejecutar_incremental(args):
+    """
+    Actualizar el modelo publicado en --artifacts con las ventas nuevas de
+    --data (--incremental / --decaimiento), sin releer el histórico
+    """
+    from entrenamiento_streaming import CHUNKSIZE, entrenar_incremental
+    
+    try:
+        if not Path(args.data).exists():
+            print(f"❌ Error: No se encontró el archivo {args.data}")
+            return 1
+        
+        estadisticos_path = Path(resolve_artifacts_dir(args.artifacts)) / ESTADISTICOS_FILENAME
+        if not estadisticos_path.exists():
+            print(f"❌ Error: No hay estadísticos del último ajuste en {estadisticos_path}; "
+                  "entrene primero el modelo completo")
+            return 1
+        
+        resultado = entrenar_incremental(args.data, cargar_estadisticos(estadisticos_path),
+                                         args.chunksize or CHUNKSIZE, args.decaimiento)
+        modelo, scaler = resultado['modelo'], resultado['scaler']
+        
+        print("\n" + "="*80)
+        print("FASE 5: EVALUACIÓN")
+        print("="*80)
+        m = resultado['metricas']
+        mostrar_metricas(m['r2_train'], m['r2_test'], m['rmse_train'], m['rmse_test'],
+                         m['mae_train'], m['mae_test'])
+        print("   (R² y RMSE sobre todos los datos acumulados; MAE solo sobre el delta)")
+        
+        guardar_modelo(modelo, scaler, args.artifacts,
+                       (resultado['estadisticos'], resultado['estadisticos_prueba'],
+                        resultado['medianas']), resultado['metricas'])
+        mostrar_ejemplos_prediccion(args.artifacts, Predictor.desde_modelo(modelo, scaler))
+        
+        print(f"📁 Artefactos guardados en: {args.artifacts}")
+        return 0
+        
+    except Exception as e:
+        print(f"❌ Error durante el entrenamiento incremental: {e}")
+        return 1
+
+def ejecutar_puntuacion(args):
+    """
+    Puntuación masiva de --puntuar con el modelo de --artifacts (--chunksize / --jobs)
+    """
+    from puntuacion import CHUNKSIZE, puntuar_fichero, ruta_salida_por_defecto
+    
+    try:
+        if not Path(args.puntuar).exists():
+            print(f"❌ Error: No se encontró el archivo {args.puntuar}")
+            return 1
+        
+        predictor = Predictor.cargar(args.artifacts)
+        puntuar_fichero(args.puntuar, args.salida or ruta_salida_por_defecto(args.puntuar),
+                        predictor.motor, args.chunksize or CHUNKSIZE, args.jobs)
+        return 0
+        
+    except Exception as e:
+        print(f"❌ Error durante la puntuación: {e}")
+        return 1
+
 def main():
     """
     Función principal que ejecuta todo el flujo CRISP-DM
@@ -522,49 +1017,92 @@ def main():
                        help='Ruta al archivo CSV de datos (default: ./precios_casa.csv)')
     parser.add_argument('--artifacts', type=str, default='./artifacts',
                        help='Directorio para guardar artefactos (default: ./artifacts)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                       help='Entrenar en streaming leyendo el CSV en bloques de N filas '
+                            '(para datasets mayores que la memoria)')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Procesos para el entrenamiento en streaming o --puntuar; la '
+                            'entrada se divide en rangos de bytes (default: 1)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directorio de la caché binaria del dataset preparado '
+                            '(default: <artifacts>/cache_datos)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='No leer ni escribir la caché del dataset')
+    parser.add_argument('--no-plots', action='store_true',
+                       help='No generar gráficos (tampoco importa matplotlib/seaborn)')
+    parser.add_argument('--plot-dpi', type=int, default=300,
+                       help='Resolución de los gráficos (default: 300)')
+    parser.add_argument('--plot-jobs', type=int, default=0,
+                       help='Renderizar los gráficos en N procesos en segundo plano, '
+                            'después de guardar el modelo (default: 0, en línea)')
+    parser.add_argument('--cv', type=int, default=5,
+                       help='Pliegues de la validación cruzada (más leave-one-out) en la '
+                            'evaluación; 0 la desactiva (default: 5)')
+    parser.add_argument('--bootstrap', type=int, default=1000,
+                       help='Réplicas bootstrap para los intervalos de confianza de las '
+                            'métricas de prueba; 0 los desactiva (default: 1000)')
+    parser.add_argument('--puntuar', type=str, default=None, metavar='ENTRADA',
+                       help='No entrenar: puntuar un CSV/Parquet con el modelo de --artifacts, '
+                            'por bloques de --chunksize filas y en --jobs procesos')
+    parser.add_argument('--salida', type=str, default=None,
+                       help='Fichero de predicciones de --puntuar, CSV o Parquet según la '
+                            'extensión (default: <entrada>_predicciones.<ext>)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Actualizar el modelo de --artifacts con las filas nuevas de --data '
+                            '(solo el delta) a partir de los estadísticos del último ajuste')
+    parser.add_argument('--decaimiento', type=float, default=1.0,
+                       help='Con --incremental, peso que conservan los datos anteriores en '
+                            'cada actualización, en (0, 1] (default: 1, sin decaimiento)')
     
     args = parser.parse_args()
     
     print("🏠 CRISP-DM + REGRESIÓN LINEAL - PREDICCIÓN DE PRECIOS DE INMUEBLES")
     print("="*80)
     
+    if args.puntuar:
+        return ejecutar_puntuacion(args)
+    
+    if args.incremental:
+        return ejecutar_incremental(args)
+    
     # Crear directorio de artefactos
     Path(args.artifacts).mkdir(parents=True, exist_ok=True)
     
+    if args.chunksize or args.jobs > 1:
+        return ejecutar_streaming(args)
+    
     try:
         # Fase 1: Comprensión del negocio
         fase1_comprension_negocio()
         
-        # Fase 2: Comprensión de los datos
-        df = cargar_datos(args.data)
-        if df is None:
-            print("❌ No se pudieron cargar los datos. Terminando ejecución.")
-            return 1
-        
-        if not explorar_datos(df):
-            print("❌ El dataset no contiene las columnas requeridas. Terminando ejecución.")
+        # Fases 2 y 3: Comprensión y preparación de los datos
+        cache_dir = None if args.no_cache else (args.cache_dir or str(Path(args.artifacts) / 'cache_datos'))
+        graficar = Graficador(not args.no_plots, args.plot_dpi, args.plot_jobs)
+        datos = cargar_datos_preparados(args.data, cache_dir, args.artifacts, graficar)
+        if datos is None:
             return 1
-        
-        generar_graficos_exploratorios(df, args.artifacts)
-        
-        # Fase 3: Preparación de los datos
-        X, y = preparar_datos(df)
+        X, y = datos
         X_train, X_test, y_train, y_test = dividir_datos(X, y)
         X_train_scaled, X_test_scaled, scaler = escalar_datos(X_train, X_test)
         
         # Fase 4: Modelado
         modelo, coef_df = entrenar_modelo(X_train_scaled, y_train)
-        generar_grafico_coeficientes(coef_df, args.artifacts)
+        graficar(generar_grafico_coeficientes, coef_df, args.artifacts)
         
         # Fase 5: Evaluación
-        r2, rmse, mae = evaluar_modelo(modelo, X_train_scaled, X_test_scaled, y_train, y_test, args.artifacts)
+        metricas = evaluar_modelo(modelo, X_train_scaled, X_test_scaled, y_train, y_test,
+                                  args.artifacts, graficar, X, y, args.cv, args.bootstrap,
+                                  detalle=True)
         
         # Fase 6: Despliegue
-        guardar_modelo(modelo, scaler, args.artifacts)
-        mostrar_ejemplos_prediccion(args.artifacts)
+        guardar_modelo(modelo, scaler, args.artifacts,
+                       estadisticos_ajuste(X, y, X_train, X_test, y_train, y_test), metricas)
+        graficar.lanzar()
+        mostrar_ejemplos_prediccion(args.artifacts, Predictor.desde_modelo(modelo, scaler))
         
         # Fase 7: Retroalimentación
         fase7_retroalimentacion()
+        graficar.esperar()
         
         print("🎉 ¡PROYECTO COMPLETADO EXITOSAMENTE!")
         print(f"📁 Artefactos guardados en: {args.artifacts}")
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento en streaming para datasets mayores que la memoria
+Lee el CSV por bloques y acumula estadísticos suficientes, de modo que la
+memoria no depende del tamaño del fichero (salvo 8 bytes por fila única
+para eliminar duplicados; el hash de la fila incluye todas las columnas y
+dos filas distintas solo se confunden si colisiona su hash de 64 bits,
+con probabilidad ≈ n² / 2**65 para n filas únicas)
+
+Con `jobs > 1` el CSV se divide en rangos de bytes alineados a líneas y
+cada rango se procesa en un proceso distinto; los estadísticos parciales
+se combinan en el proceso principal.
+
+El modo incremental parte de los estadísticos guardados con el último
+modelo y solo lee el CSV de filas nuevas (el delta).
+"""
+
+import csv
+import io
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from estadisticos import (
+    COLUMNAS, ConjuntoHashes, EstadisticosSuficientes, MuestraHash,
+    es_prueba, hash_filas, limpiar_bloque,
+)
+
+# Filas por bloque por defecto
+CHUNKSIZE = 1_000_000
+
+
+class _RangoArchivo(io.RawIOBase):
+    """Vista de solo lectura de los bytes [inicio, fin) de un fichero"""
+
+    def __init__(self, f, inicio, fin):
+        f.seek(inicio)
+        self._f = f
+        self._restantes = fin - inicio
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._restantes)
+        if n <= 0:
+            return 0
+        leidos = self._f.readinto(memoryview(b)[:n])
+        self._restantes -= leidos
+        return leidos
+
+
+def leer_cabecera(path):
+    """(nombres de columna, offset de la primera fila de datos)"""
+    with open(path, 'rb') as f:
+        linea = f.readline()
+        return next(csv.reader([linea.decode('utf-8-sig').rstrip('\r\n')])), f.tell()
+
+
+def particionar(path, partes):
+    """
+    Dividir el CSV en `partes` rangos de bytes contiguos que empiezan y
+    terminan en un salto de línea (no admite saltos de línea entre comillas)
+    """
+    _, datos = leer_cabecera(path)
+    total = os.path.getsize(path)
+    limites = [datos]
+    with open(path, 'rb') as f:
+        for i in range(1, partes):
+            pos = datos + (total - datos) * i // partes
+            f.seek(pos - 1)
+            f.readline()
+            limites.append(max(limites[-1], min(f.tell(), total)))
+    limites.append(total)
+    return [(a, b) for a, b in zip(limites, limites[1:]) if a < b]
+
+
+def leer_csv_por_bloques(path, chunksize=CHUNKSIZE, rango=None, usecols=None, dtype=None):
+    """
+    DataFrames de hasta `chunksize` filas del CSV
+
+    `rango` limita la lectura a un rango de bytes devuelto por particionar().
+    """
+    cabecera, datos = leer_cabecera(path)
+    inicio, fin = rango or (datos, os.path.getsize(path))
+    if inicio >= fin:
+        return
+    with open(path, 'rb') as f:
+        lector = io.BufferedReader(_RangoArchivo(f, inicio, fin), 1 << 20)
+        yield from pd.read_csv(lector, header=None, names=cabecera, usecols=usecols,
+                               dtype=dtype, chunksize=chunksize)
+
+
+def leer_lineas_por_bloques(path, chunksize=CHUNKSIZE, rango=None):
+    """Listas de hasta `chunksize` líneas en bruto (bytes) del CSV, sin la cabecera"""
+    _, datos = leer_cabecera(path)
+    inicio, fin = rango or (datos, os.path.getsize(path))
+    with open(path, 'rb') as f:
+        lector = io.BufferedReader(_RangoArchivo(f, inicio, fin), 1 << 20)
+        while True:
+            lineas = list(itertools.islice(lector, chunksize))
+            if not lineas:
+                return
+            yield lineas
+
+
+def leer_bloques(path, chunksize=CHUNKSIZE, rango=None):
+    """
+    (bloque, extra) por bloque del CSV: bloque float64 (n, 4) con las
+    columnas COLUMNAS (no numéricos → NaN) y extra el hash uint64 del resto
+    de columnas, como texto para que no dependa del tipo inferido en cada
+    bloque (None si el CSV no tiene más columnas)
+    """
+    cabecera, _ = leer_cabecera(path)
+    otras = [col for col in cabecera if col not in COLUMNAS]
+    usecols = None if otras else COLUMNAS
+    for chunk in leer_csv_por_bloques(path, chunksize, rango, usecols=usecols,
+                                      dtype=dict.fromkeys(otras, str)):
+        bloque = np.column_stack([
+            pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64)
+            for col in COLUMNAS
+        ])
+        extra = pd.util.hash_pandas_object(chunk[otras], index=False).to_numpy() if otras else None
+        yield bloque, extra
+
+
+def calcular_medianas(bloques, k=100_000):
+    """
+    Muestra (MuestraHash) para las medianas: las k filas distintas de hash
+    más bajo, que no dependen de cómo se reparta el fichero entre procesos
+    """
+    muestra = MuestraHash(k)
+    for bloque, extra in bloques:
+        muestra.agregar(bloque, hash_filas(bloque, extra))
+    return muestra
+
+
+def acumular_estadisticos(bloques, medianas, fraccion_prueba=0.2, excluidos=None):
+    """
+    Limpiar cada bloque (imputación, duplicados, rango de precio) y acumular
+    los estadísticos de entrenamiento y prueba
+
+    La partición train/test se decide con el hash de cada fila, de modo que
+    es determinista y no depende del orden ni del tamaño de los bloques.
+    Con `excluidos` (hashes ordenados) solo se acumulan esas filas, una vez
+    cada una: sirve para descontar duplicados entre rangos.
+    Devuelve (train, test, conteo, hashes únicos ordenados).
+    """
+    vistos = ConjuntoHashes()
+    train = EstadisticosSuficientes()
+    test = EstadisticosSuficientes()
+    conteo = {'leidas': 0, 'duplicados': 0, 'fuera_rango': 0}
+
+    for bloque, extra in bloques:
+        conteo['leidas'] += len(bloque)
+        en_rango = limpiar_bloque(bloque, medianas)
+        hashes = hash_filas(bloque, extra)
+        nuevas = vistos.nuevos(hashes)
+        if excluidos is not None:
+            nuevas &= np.isin(hashes, excluidos)
+        conteo['duplicados'] += int((~nuevas).sum())
+        conteo['fuera_rango'] += int((nuevas & ~en_rango).sum())
+
+        filas = bloque[nuevas & en_rango]
+        prueba = es_prueba(hashes[nuevas & en_rango], fraccion_prueba)
+        train.agregar(filas[~prueba, :3], filas[~prueba, 3])
+        test.agregar(filas[prueba, :3], filas[prueba, 3])
+
+    return train, test, conteo, vistos.ordenados()
+
+
+def error_absoluto(bloques, medianas, pesos, intercepto, fraccion_prueba=0.2, excluidos=None):
+    """
+    Suma de errores absolutos y número de filas de [entrenamiento, prueba]
+    (requiere una pasada adicional); `excluidos` son hashes que ya cuenta
+    otro rango
+    """
+    vistos = ConjuntoHashes()
+    suma = np.zeros(2)
+    filas = np.zeros(2)
+    for bloque, extra in bloques:
+        en_rango = limpiar_bloque(bloque, medianas)
+        hashes = hash_filas(bloque, extra)
+        mascara = vistos.nuevos(hashes) & en_rango
+        if excluidos is not None and len(excluidos):
+            mascara &= ~np.isin(hashes, excluidos)
+        prueba = es_prueba(hashes[mascara], fraccion_prueba)
+        errores = np.abs(bloque[mascara, 3] - bloque[mascara, :3] @ pesos - intercepto)
+        suma += [errores[~prueba].sum(), errores[prueba].sum()]
+        filas += [(~prueba).sum(), prueba.sum()]
+    return suma, filas
+
+
+# Tareas por rango (funciones de módulo para poder enviarlas a otros procesos)
+
+def _medianas_rango(path, rango, chunksize):
+    return calcular_medianas(leer_bloques(path, chunksize, rango))
+
+
+def _estadisticos_rango(path, rango, chunksize, medianas, fraccion_prueba, excluidos=None):
+    return acumular_estadisticos(leer_bloques(path, chunksize, rango), medianas,
+                                 fraccion_prueba, excluidos)
+
+
+def _error_rango(path, rango, chunksize, medianas, pesos, intercepto, fraccion_prueba,
+                 excluidos):
+    return error_absoluto(leer_bloques(path, chunksize, rango), medianas, pesos, intercepto,
+                          fraccion_prueba, excluidos)
+
+
+def duplicados_entre_rangos(hashes_por_rango):
+    """
+    Para cada rango, hashes que ya aparecen en un rango anterior: esas filas
+    las cuenta el primer rango y los demás deben descontarlas
+    """
+    excluidos = []
+    acumulado = np.empty(0, np.uint64)
+    for hashes in hashes_por_rango:
+        excluidos.append(np.intersect1d(hashes, acumulado, assume_unique=True))
+        acumulado = np.union1d(acumulado, hashes)
+    return excluidos
+
+
+def entrenar_streaming(path, chunksize=CHUNKSIZE, fraccion_prueba=0.2, jobs=1):
+    """
+    Entrenar StandardScaler + LinearRegression leyendo `path` por bloques
+
+    Tres pasadas sobre el CSV: medianas aproximadas, estadísticos
+    suficientes (ajuste, R² y RMSE) y MAE. Con `jobs > 1` cada pasada se
+    reparte en `jobs` procesos por rangos de bytes; si hay filas repetidas
+    entre rangos se hace una pasada extra para descontarlas.
+    """
+    print("\n" + "="*80)
+    print("ENTRENAMIENTO EN STREAMING")
+    print("="*80)
+    rangos = particionar(path, jobs) if jobs > 1 else [None]
+    print(f"📁 Leyendo {path} en bloques de {chunksize} filas"
+          + (f" ({len(rangos)} rangos en {jobs} procesos)" if jobs > 1 else ""))
+    t0 = time.perf_counter()
+    n = len(rangos)
+
+    with ProcessPoolExecutor(jobs) if jobs > 1 else nullcontext() as pool:
+        mapear = pool.map if pool else map
+
+        print("\n🔧 Pasada 1: medianas aproximadas para imputar valores faltantes...")
+        parciales = list(mapear(_medianas_rango, [path] * n, rangos, [chunksize] * n))
+        muestra = parciales[0]
+        for otra in parciales[1:]:
+            muestra.fusionar(otra)
+        medianas = muestra.medianas()
+        for col, mediana in zip(COLUMNAS, medianas):
+            print(f"   • {col}: mediana ≈ {mediana:.2f}")
+
+        print("\n📊 Pasada 2: limpieza y estadísticos suficientes...")
+        parciales = list(mapear(_estadisticos_rango, [path] * n, rangos, [chunksize] * n,
+                                [medianas] * n, [fraccion_prueba] * n))
+        train, test = EstadisticosSuficientes(), EstadisticosSuficientes()
+        conteo = dict.fromkeys(parciales[0][2], 0)
+        for train_i, test_i, conteo_i, _ in parciales:
+            train.fusionar(train_i)
+            test.fusionar(test_i)
+            for clave in conteo:
+                conteo[clave] += conteo_i[clave]
+
+        excluidos = duplicados_entre_rangos([p[3] for p in parciales])
+        del parciales
+        con_repetidas = [i for i in range(n) if len(excluidos[i])]
+        if con_repetidas:
+            print(f"   • Descontando filas repetidas entre rangos en {len(con_repetidas)} rangos...")
+            m = len(con_repetidas)
+            for train_i, test_i, conteo_i, _ in mapear(
+                    _estadisticos_rango, [path] * m, [rangos[i] for i in con_repetidas],
+                    [chunksize] * m, [medianas] * m, [fraccion_prueba] * m,
+                    [excluidos[i] for i in con_repetidas]):
+                train.restar(train_i)
+                test.restar(test_i)
+                repetidas = conteo_i['leidas'] - conteo_i['duplicados']
+                conteo['duplicados'] += repetidas
+                conteo['fuera_rango'] -= conteo_i['fuera_rango']
+
+        print(f"   • Filas leídas: {conteo['leidas']}")
+        print(f"   • Duplicados eliminados: {conteo['duplicados']}")
+        print(f"   • Filas eliminadas por precio fuera de rango: {conteo['fuera_rango']}")
+        print(f"   • Entrenamiento: {int(train.n)} muestras | Prueba: {int(test.n)} muestras")
+
+        modelo, scaler = train.ajustar()
+        pesos, intercepto = train.coeficientes()
+        r2_train, rmse_train = train.metricas(pesos, intercepto)
+        r2_test, rmse_test = test.metricas(pesos, intercepto)
+
+        print("\n🔮 Pasada 3: error absoluto medio...")
+        suma, filas = np.zeros(2), np.zeros(2)
+        for suma_i, filas_i in mapear(_error_rango, [path] * n, rangos, [chunksize] * n,
+                                      [medianas] * n, [pesos] * n, [intercepto] * n,
+                                      [fraccion_prueba] * n, excluidos):
+            suma += suma_i
+            filas += filas_i
+        mae_train, mae_test = suma / np.maximum(filas, 1)
+
+    print(f"✅ Entrenamiento en streaming completado en {time.perf_counter() - t0:.1f}s")
+
+    return {
+        'modelo': modelo,
+        'scaler': scaler,
+        'medianas': medianas,
+        'estadisticos': train,
+        'estadisticos_prueba': test,
+        'conteo': conteo,
+        'metricas': {
+            'r2_train': r2_train, 'r2_test': r2_test,
+            'rmse_train': rmse_train, 'rmse_test': rmse_test,
+            'mae_train': float(mae_train), 'mae_test': float(mae_test),
+        },
+    }
+
+
+def entrenar_incremental(path, previos, chunksize=CHUNKSIZE, decaimiento=1.0,
+                         fraccion_prueba=0.2):
+    """
+    Actualizar el modelo con las filas nuevas de `path` sin releer el histórico
+
+    `previos` son (train, test, medianas) del último ajuste. Los datos
+    anteriores se ponderan por `decaimiento` (1 = sin decaimiento) y se
+    suman los estadísticos del delta, limpiado con las mismas medianas y
+    particionado por hash como en entrenar_streaming(). Dos pasadas sobre
+    el delta: estadísticos y MAE (el MAE se mide solo sobre el delta, el
+    histórico no se vuelve a leer). Los duplicados se eliminan dentro del
+    delta, no contra el histórico.
+    """
+    print("\n" + "="*80)
+    print("ENTRENAMIENTO INCREMENTAL")
+    print("="*80)
+    if not 0 < decaimiento <= 1:
+        raise ValueError(f"El decaimiento debe estar en (0, 1]: {decaimiento}")
+    train, test, medianas = previos
+    train, test = train + EstadisticosSuficientes(), test + EstadisticosSuficientes()
+    print(f"📦 Estadísticos previos: {train.n:.0f} muestras de entrenamiento, "
+          f"{test.n:.0f} de prueba")
+    if decaimiento < 1:
+        train.escalar(decaimiento)
+        test.escalar(decaimiento)
+        print(f"   • Peso de los datos anteriores tras el decaimiento ({decaimiento}): "
+              f"{train.n:.0f} + {test.n:.0f}")
+    t0 = time.perf_counter()
+
+    print(f"\n📊 Pasada 1: limpieza y estadísticos del delta ({path})...")
+    train_d, test_d, conteo, _ = acumular_estadisticos(leer_bloques(path, chunksize), medianas,
+                                                       fraccion_prueba)
+    print(f"   • Filas leídas: {conteo['leidas']}")
+    print(f"   • Duplicados eliminados: {conteo['duplicados']}")
+    print(f"   • Filas eliminadas por precio fuera de rango: {conteo['fuera_rango']}")
+    print(f"   • Nuevas: {int(train_d.n)} de entrenamiento | {int(test_d.n)} de prueba")
+    if train_d.n + test_d.n == 0:
+        raise ValueError(f"{path} no contiene filas válidas")
+    train.fusionar(train_d)
+    test.fusionar(test_d)
+
+    modelo, scaler = train.ajustar()
+    pesos, intercepto = train.coeficientes()
+    r2_train, rmse_train = train.metricas(pesos, intercepto)
+    r2_test, rmse_test = test.metricas(pesos, intercepto)
+
+    print("\n🔮 Pasada 2: error absoluto medio sobre el delta...")
+    suma, filas = error_absoluto(leer_bloques(path, chunksize), medianas, pesos, intercepto,
+                                 fraccion_prueba)
+    mae_train, mae_test = suma / np.maximum(filas, 1)
+
+    print(f"✅ Entrenamiento incremental completado en {time.perf_counter() - t0:.1f}s")
+
+    return {
+        'modelo': modelo,
+        'scaler': scaler,
+        'medianas': medianas,
+        'estadisticos': train,
+        'estadisticos_prueba': test,
+        'conteo': conteo,
+        'metricas': {
+            'r2_train': r2_train, 'r2_test': r2_test,
+            'rmse_train': rmse_train, 'rmse_test': rmse_test,
+            'mae_train': float(mae_train), 'mae_test': float(mae_test),
+        },
+    }
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Estadísticos suficientes y estructuras en streaming para la regresión lineal
+Permiten entrenar por bloques con memoria acotada y combinar resultados
+parciales (por bloques, por procesos o entre entrenamientos sucesivos)
+"""
+
+import numpy as np
+
+FEATURES = ['size', 'bedrooms', 'age']
+COLUMNAS = FEATURES + ['price']
+
+# Rango válido del precio (mismo filtro que preparar_datos)
+PRECIO_MIN, PRECIO_MAX = 0, 1000
+
+# Estadísticos acumulados del último ajuste, junto al modelo de cada versión
+ESTADISTICOS_FILENAME = 'estadisticos.npz'
+
+
+class EstadisticosSuficientes:
+    """
+    Medias y co-momentos centrados de (X, y), combinables por bloques
+
+    Se guardan n, las medias y las matrices centradas Cxx = Σ(x-x̄)(x-x̄)ᵀ,
+    Cxy y Cyy. La combinación usa la fórmula de Chan et al., numéricamente
+    estable, y `n` admite pesos no enteros (decaimiento exponencial).
+    """
+
+    def __init__(self, p=len(FEATURES)):
+        self.n = 0.0
+        self.media_x = np.zeros(p)
+        self.media_y = 0.0
+        self.cxx = np.zeros((p, p))
+        self.cxy = np.zeros(p)
+        self.cyy = 0.0
+
+    @classmethod
+    def desde_datos(cls, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        est = cls(X.shape[1])
+        if len(X) == 0:
+            return est
+        est.n = float(len(X))
+        est.media_x = X.mean(axis=0)
+        est.media_y = float(y.mean())
+        Xc = X - est.media_x
+        yc = y - est.media_y
+        est.cxx = Xc.T @ Xc
+        est.cxy = Xc.T @ yc
+        est.cyy = float(yc @ yc)
+        return est
+
+    def agregar(self, X, y):
+        """Incorporar un bloque de filas"""
+        return self.fusionar(self.desde_datos(X, y))
+
+    def fusionar(self, otro):
+        """Combinar (in place) con los estadísticos de otro conjunto de filas"""
+        if otro.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update({k: np.copy(v) if isinstance(v, np.ndarray) else v
+                                  for k, v in otro.__dict__.items()})
+            return self
+        n = self.n + otro.n
+        dx = otro.media_x - self.media_x
+        dy = otro.media_y - self.media_y
+        factor = self.n * otro.n / n
+        self.cxx = self.cxx + otro.cxx + factor * np.outer(dx, dx)
+        self.cxy = self.cxy + otro.cxy + factor * dx * dy
+        self.cyy = self.cyy + otro.cyy + factor * dy * dy
+        self.media_x = self.media_x + dx * otro.n / n
+        self.media_y = self.media_y + dy * otro.n / n
+        self.n = n
+        return self
+
+    def restar(self, otro):
+        """Quitar (in place) filas ya incluidas cuyos estadísticos son `otro`"""
+        if otro.n == 0:
+            return self
+        n = self.n - otro.n
+        if n <= 0:
+            self.__init__(len(self.media_x))
+            return self
+        media_x = (self.n * self.media_x - otro.n * otro.media_x) / n
+        media_y = (self.n * self.media_y - otro.n * otro.media_y) / n
+        dx = media_x - otro.media_x
+        dy = media_y - otro.media_y
+        factor = n * otro.n / self.n
+        self.cxx = self.cxx - otro.cxx - factor * np.outer(dx, dx)
+        self.cxy = self.cxy - otro.cxy - factor * dx * dy
+        self.cyy = self.cyy - otro.cyy - factor * dy * dy
+        self.media_x, self.media_y, self.n = media_x, media_y, n
+        return self
+
+    def escalar(self, factor):
+        """
+        Multiplicar (in place) el peso de todas las filas por `factor`:
+        decaimiento exponencial de los datos ya acumulados
+        """
+        self.n *= factor
+        self.cxx = self.cxx * factor
+        self.cxy = self.cxy * factor
+        self.cyy *= factor
+        return self
+
+    def a_arrays(self, prefijo):
+        return {f'{prefijo}_n': np.float64(self.n), f'{prefijo}_media_x': self.media_x,
+                f'{prefijo}_media_y': np.float64(self.media_y), f'{prefijo}_cxx': self.cxx,
+                f'{prefijo}_cxy': self.cxy, f'{prefijo}_cyy': np.float64(self.cyy)}
+
+    @classmethod
+    def desde_arrays(cls, arrays, prefijo):
+        est = cls(len(arrays[f'{prefijo}_media_x']))
+        est.n = float(arrays[f'{prefijo}_n'])
+        est.media_x = np.array(arrays[f'{prefijo}_media_x'], dtype=np.float64)
+        est.media_y = float(arrays[f'{prefijo}_media_y'])
+        est.cxx = np.array(arrays[f'{prefijo}_cxx'], dtype=np.float64)
+        est.cxy = np.array(arrays[f'{prefijo}_cxy'], dtype=np.float64)
+        est.cyy = float(arrays[f'{prefijo}_cyy'])
+        return est
+
+    def __add__(self, otro):
+        return EstadisticosSuficientes(len(self.media_x)).fusionar(self).fusionar(otro)
+
+    def __sub__(self, otro):
+        return EstadisticosSuficientes(len(self.media_x)).fusionar(self).restar(otro)
+
+    def coeficientes(self):
+        """(pesos, intercepto) de mínimos cuadrados en unidades originales"""
+        pesos = np.linalg.lstsq(self.cxx, self.cxy, rcond=None)[0]
+        return pesos, self.media_y - float(pesos @ self.media_x)
+
+    def sse(self, pesos, intercepto):
+        """Suma de residuos al cuadrado de y ≈ X·pesos + intercepto sobre estas filas"""
+        sesgo = self.media_y - intercepto - float(pesos @ self.media_x)
+        return float(self.cyy - 2 * pesos @ self.cxy + pesos @ self.cxx @ pesos
+                     + self.n * sesgo * sesgo)
+
+    def metricas(self, pesos, intercepto):
+        """(R², RMSE) de un modelo lineal sobre estas filas, sin recorrerlas"""
+        sse = self.sse(pesos, intercepto)
+        r2 = 1 - sse / self.cyy if self.cyy > 0 else float('nan')
+        return r2, float(np.sqrt(sse / self.n))
+
+    def ajustar(self):
+        """
+        StandardScaler + LinearRegression equivalentes a ajustarlos con
+        sklearn sobre las mismas filas
+        """
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+
+        p = len(self.media_x)
+        var = np.diag(self.cxx) / self.n
+        escala = np.sqrt(var)
+        escala[escala < 10 * np.finfo(np.float64).eps] = 1.0
+
+        scaler = StandardScaler()
+        scaler.mean_ = self.media_x.copy()
+        scaler.var_ = var
+        scaler.scale_ = escala
+        scaler.n_samples_seen_ = int(round(self.n))
+        scaler.n_features_in_ = p
+        scaler.feature_names_in_ = np.array(FEATURES[:p], dtype=object)
+
+        # En el espacio escalado las variables están centradas: el intercepto es ȳ
+        czz = self.cxx / np.outer(escala, escala)
+        czy = self.cxy / escala
+        coef, _, rank, singular = np.linalg.lstsq(czz, czy, rcond=None)
+
+        modelo = LinearRegression()
+        modelo.coef_ = coef
+        modelo.intercept_ = float(self.media_y)
+        modelo.n_features_in_ = p
+        modelo.rank_ = int(rank)
+        modelo.singular_ = np.sqrt(np.maximum(singular, 0))
+        return modelo, scaler
+
+
+class MuestraHash:
+    """
+    Muestra determinista de filas para estimar cuantiles en streaming
+
+    Conserva las `k` filas distintas de hash más bajo (bottom-k) con cuántas
+    veces aparece cada una. La muestra depende solo del contenido del
+    fichero, no del orden ni del reparto en bloques o procesos: fusionar
+    muestras parciales da la misma muestra que una sola pasada. Con menos
+    de `k` filas distintas la muestra es completa y los cuantiles son
+    exactos (como np.nanquantile).
+    """
+
+    def __init__(self, k=100_000, m=len(COLUMNAS)):
+        self.k = k
+        self.claves = np.empty(0, np.uint64)
+        self.filas = np.empty((0, m))
+        self.cuentas = np.empty(0, np.int64)
+
+    def agregar(self, filas, claves):
+        """Añadir las filas de un bloque con sus hashes"""
+        return self._combinar(claves, np.asarray(filas, dtype=np.float64),
+                              np.ones(len(claves), dtype=np.int64))
+
+    def fusionar(self, otra):
+        return self._combinar(otra.claves, otra.filas, otra.cuentas)
+
+    def _combinar(self, claves, filas, cuentas):
+        if len(self.claves) >= self.k:
+            # Muestra llena: solo pueden entrar claves hasta la mayor guardada
+            dentro = claves <= self.claves[-1]
+            claves, filas, cuentas = claves[dentro], filas[dentro], cuentas[dentro]
+        if not len(claves):
+            return self
+        # self.claves ya está ordenada: el orden estable (timsort) solo
+        # tiene que fusionar dos tramos ordenados
+        orden = np.argsort(claves, kind='stable')
+        claves = np.concatenate([self.claves, claves[orden]])
+        filas = np.concatenate([self.filas, filas[orden]])
+        cuentas = np.concatenate([self.cuentas, cuentas[orden]])
+        orden = np.argsort(claves, kind='stable')
+        claves, filas, cuentas = claves[orden], filas[orden], cuentas[orden]
+        primeras = np.ones(len(claves), dtype=bool)
+        np.not_equal(claves[1:], claves[:-1], out=primeras[1:])
+        inicios = np.flatnonzero(primeras)
+
+        # Colisión de hash entre filas distintas (muy rara): el representante
+        # de la clave es la menor fila, sin depender del orden de llegada
+        grupo = np.cumsum(primeras) - 1
+        cabezas = filas[inicios[grupo]]
+        distintas = ~((filas == cabezas) | (np.isnan(filas) & np.isnan(cabezas))).all(axis=1)
+        for g in np.unique(grupo[distintas]):
+            idx = np.flatnonzero(grupo == g)
+            filas[inicios[g]] = filas[idx[np.lexsort(filas[idx].T[::-1])[0]]]
+
+        self.cuentas = np.add.reduceat(cuentas, inicios)[:self.k]
+        inicios = inicios[:self.k]
+        self.claves = claves[inicios]
+        self.filas = filas[inicios]
+        return self
+
+    def cuantil(self, columna, q):
+        """Cuantil de una columna (sin NaN), con interpolación lineal como np.quantile"""
+        valores = self.filas[:, columna]
+        validos = ~np.isnan(valores)
+        valores, pesos = valores[validos], self.cuentas[validos]
+        if not len(valores):
+            return float('nan')
+        orden = np.argsort(valores, kind='stable')
+        valores, acumulado = valores[orden], np.cumsum(pesos[orden])
+        # Posiciones en la muestra con las repeticiones expandidas
+        pos = q * (acumulado[-1] - 1)
+        bajo, alto = np.searchsorted(acumulado, [np.floor(pos), np.ceil(pos)], side='right')
+        return float(valores[bajo] + (valores[alto] - valores[bajo]) * (pos - np.floor(pos)))
+
+    def medianas(self):
+        return np.array([self.cuantil(col, 0.5) for col in range(self.filas.shape[1])])
+
+
+def _mezclar(h, tmp=None):
+    """Finalizador splitmix64 in place (aritmética uint64 con desbordamiento)"""
+    tmp = np.empty_like(h) if tmp is None else tmp
+    with np.errstate(over='ignore'):
+        for desplazamiento, multiplicador in ((30, 0xBF58476D1CE4E5B9),
+                                              (27, 0x94D049BB133111EB)):
+            np.right_shift(h, np.uint64(desplazamiento), out=tmp)
+            h ^= tmp
+            h *= np.uint64(multiplicador)
+        np.right_shift(h, np.uint64(31), out=tmp)
+        h ^= tmp
+    return h
+
+
+# Filas por tramo en las operaciones que recorren bloques grandes
+TRAMO = 1 << 18
+
+
+def hash_filas(bloque, extra=None):
+    """
+    Hash de 64 bits de cada fila de un bloque float64 (n, m); `extra`
+    (uint64 por fila, p. ej. el hash de las columnas no numéricas) se
+    mezcla con las columnas del bloque
+    """
+    h = np.full(len(bloque), 0x9E3779B97F4A7C15, dtype=np.uint64)
+    if extra is not None:
+        h ^= extra
+    tmp = np.empty(min(len(bloque), TRAMO), dtype=np.uint64)
+    # Por tramos: los temporales caben en caché y no ocupan n × 8 bytes
+    for i in range(0, len(bloque), TRAMO):
+        parte = h[i:i + TRAMO]
+        t = tmp[:len(parte)]
+        for col in range(bloque.shape[1]):
+            # + 0.0 unifica -0.0 y 0.0, que drop_duplicates considera iguales
+            np.add(bloque[i:i + TRAMO, col], 0.0, out=t.view(np.float64))
+            parte ^= t
+            _mezclar(parte, t)
+    return h
+
+
+def primeras_apariciones(bloque, hashes=None):
+    """
+    Máscara de la primera aparición de cada fila (como drop_duplicates
+    sobre las columnas del bloque)
+
+    Los bits altos del hash y el índice de fila se empaquetan en un uint64
+    que se ordena por valor: las filas con el mismo hash quedan juntas y la
+    primera de cada grupo es la de menor índice. Cada fila se compara con
+    la cabeza de su grupo, así que una colisión nunca elimina una fila
+    distinta.
+    """
+    n = len(bloque)
+    mascara = np.zeros(n, dtype=bool)
+    if n == 0:
+        return mascara
+    # Si el hash se calcula aquí se reutiliza su memoria para la clave
+    clave = hash_filas(bloque) if hashes is None else hashes.copy()
+    tipo = np.int32 if n < 2**31 else np.int64
+    bits = max(1, (n - 1).bit_length())
+    bajos = np.uint64((1 << bits) - 1)
+
+    clave &= ~bajos
+    for i in range(0, n, TRAMO):
+        clave[i:i + TRAMO] |= np.arange(i, min(n, i + TRAMO), dtype=np.uint64)
+    clave.sort()
+    indice = np.empty(n, dtype=tipo)
+    for i in range(0, n, TRAMO):
+        indice[i:i + TRAMO] = clave[i:i + TRAMO] & bajos
+    clave >>= np.uint64(bits)
+    inicio = np.empty(n, dtype=bool)
+    inicio[0] = True
+    np.not_equal(clave[1:], clave[:-1], out=inicio[1:])
+    del clave
+    mascara[indice[inicio]] = True
+
+    # Posición (en el orden de la clave) de la cabeza del grupo de cada fila
+    cabeza = np.arange(n, dtype=tipo)
+    cabeza[~inicio] = 0
+    np.maximum.accumulate(cabeza, out=cabeza)
+    resto = np.flatnonzero(~inicio)
+    cabezas = cabeza[resto]
+    del cabeza
+    distinta = np.zeros(len(resto), dtype=bool)
+    for i in range(0, len(resto), TRAMO):
+        filas = indice[resto[i:i + TRAMO]]
+        primeras = indice[cabezas[i:i + TRAMO]]
+        for col in range(bloque.shape[1]):
+            a = bloque[filas, col]
+            b = bloque[primeras, col]
+            distinta[i:i + TRAMO] |= (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+    # Colisiones de hash (raras): resolver esos grupos comparando filas
+    inicios = np.flatnonzero(inicio)
+    for pos in np.unique(cabezas[distinta]):
+        fin = inicios[np.searchsorted(inicios, pos, side='right')] if pos < inicios[-1] else n
+        vistas = set()
+        for fila in indice[pos:fin]:
+            valores = tuple(np.nan_to_num(bloque[fila] + 0.0, nan=np.inf).tolist())
+            if valores not in vistas:
+                vistas.add(valores)
+                mascara[fila] = True
+    return mascara
+
+
+def es_prueba(hashes, fraccion=0.2):
+    """Asignación determinista train/test a partir del hash de la fila"""
+    u = _mezclar(hashes ^ np.uint64(0xD1B54A32D192ED03)) >> np.uint64(11)
+    return u < np.uint64(int(fraccion * (1 << 53)))
+
+
+class ConjuntoHashes:
+    """
+    Conjunto de hashes uint64 para eliminar duplicados en streaming
+
+    Guarda corridas ordenadas que se fusionan como un contador binario: 8
+    bytes por fila única y O(log n) corridas que consultar por bloque.
+
+    Es aproximado: solo se guarda el hash, así que dos filas distintas con
+    el mismo hash de 64 bits se tratan como duplicado y la segunda se
+    descarta. La probabilidad de alguna colisión entre n filas únicas es
+    ≈ n² / 2**65 (≈ 3e-8 con 10⁶ filas, ≈ 3e-4 con 10⁸).
+    """
+
+    def __init__(self):
+        self._corridas = []
+
+    def __len__(self):
+        return sum(len(c) for c in self._corridas)
+
+    def ordenados(self):
+        """Todos los hashes registrados, ordenados"""
+        return np.sort(np.concatenate(self._corridas)) if self._corridas else np.empty(0, np.uint64)
+
+    def nuevos(self, hashes):
+        """
+        Máscara de filas no vistas antes (ni repetidas antes en el bloque);
+        las registra en el conjunto
+        """
+        unicos, primeros = np.unique(hashes, return_index=True)
+        vistos = np.zeros(len(unicos), dtype=bool)
+        for corrida in self._corridas:
+            pos = np.searchsorted(corrida, unicos)
+            pos[pos == len(corrida)] = 0
+            vistos |= corrida[pos] == unicos
+        nuevos = unicos[~vistos]
+        mascara = np.zeros(len(hashes), dtype=bool)
+        mascara[primeros[~vistos]] = True
+
+        if len(nuevos):
+            self._corridas.append(nuevos)
+        while len(self._corridas) > 1 and len(self._corridas[-2]) <= 2 * len(self._corridas[-1]):
+            ultima = self._corridas.pop()
+            self._corridas[-1] = np.union1d(self._corridas[-1], ultima)
+        return mascara
+
+
+def limpiar_bloque(bloque, medianas):
+    """
+    Imputar NaN con las medianas (in place) y devolver la máscara de filas
+    con precio dentro de rango
+    """
+    for col in range(bloque.shape[1]):
+        faltantes = np.isnan(bloque[:, col])
+        if faltantes.any():
+            bloque[faltantes, col] = medianas[col]
+    precio = bloque[:, COLUMNAS.index('price')]
+    return (precio > PRECIO_MIN) & (precio < PRECIO_MAX)
+
+
+def guardar_estadisticos(path, train, test, medianas):
+    """Guardar los estadísticos de entrenamiento y prueba y las medianas de imputación"""
+    with open(path, 'wb') as f:
+        np.savez(f, medianas=np.asarray(medianas, dtype=np.float64),
+                 **train.a_arrays('train'), **test.a_arrays('test'))
+
+
+def cargar_estadisticos(path):
+    """(train, test, medianas) guardados por guardar_estadisticos()"""
+    with np.load(path, allow_pickle=False) as arrays:
+        return (EstadisticosSuficientes.desde_arrays(arrays, 'train'),
+                EstadisticosSuficientes.desde_arrays(arrays, 'test'),
+                np.array(arrays['medianas'], dtype=np.float64))
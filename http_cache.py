@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Respuestas HTTP pre-renderizadas y pre-comprimidas
+ETag / Last-Modified, negociación de gzip/brotli y respuestas 304
+"""
+
+import gzip
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+
+def _accepted_encodings(accept_encoding):
+    """Codificaciones aceptadas por el cliente (ignorando las de q=0)"""
+    aceptadas = set()
+    for parte in (accept_encoding or '').split(','):
+        nombre, _, params = parte.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if nombre:
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+class CachedPage:
+    """Cuerpo HTML renderizado una vez, con sus variantes comprimidas"""
+
+    __slots__ = ('key', 'body', 'gzip', 'brotli', 'etag', 'last_modified', '_mtime')
+
+    def __init__(self, body, key=None, mtime=None):
+        self.key = key
+        self.body = body
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+        self.brotli = brotli.compress(body, quality=11) if brotli is not None else None
+        # ETag débil: el mismo valor identifica todas las codificaciones
+        self.etag = 'W/"%s"' % hashlib.sha256(body).hexdigest()[:20]
+        self._mtime = int(mtime) if mtime is not None else None
+        self.last_modified = formatdate(mtime, usegmt=True) if mtime is not None else None
+
+    def not_modified(self, if_none_match=None, if_modified_since=None):
+        """True si la petición condicional puede responderse con 304"""
+        if if_none_match:
+            etiquetas = {t.strip().removeprefix('W/') for t in if_none_match.split(',')}
+            return '*' in etiquetas or self.etag.removeprefix('W/') in etiquetas
+        if if_modified_since and self._mtime is not None:
+            try:
+                return self._mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def negotiate(self, accept_encoding=None):
+        """(cuerpo, codificación) según el Accept-Encoding del cliente"""
+        aceptadas = _accepted_encodings(accept_encoding)
+        if self.brotli is not None and 'br' in aceptadas:
+            return self.brotli, 'br'
+        if 'gzip' in aceptadas:
+            return self.gzip, 'gzip'
+        return self.body, None
+
+    def headers(self, encoding=None):
+        """Cabeceras de caché (y Content-Encoding) de la respuesta"""
+        cabeceras = [('ETag', self.etag), ('Vary', 'Accept-Encoding'),
+                     ('Cache-Control', 'no-cache')]
+        if self.last_modified:
+            cabeceras.append(('Last-Modified', self.last_modified))
+        if encoding:
+            cabeceras.append(('Content-Encoding', encoding))
+        return cabeceras
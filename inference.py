@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Inferencia vectorizada para el modelo de precios de inmuebles
+Validación de rangos con máscaras de NumPy, predicción por lotes y modelo
+fusionado (StandardScaler plegado en los coeficientes de la regresión)
+"""
+
+import math
+import os
+import warnings
+
+import numpy as np
+
+from artifact_store import atomic_path
+
+FEATURES = ('size', 'bedrooms', 'age')
+
+# Rangos válidos (mismos que la interfaz web y predict_price)
+RANGOS = {
+    'size': (40, 120),
+    'bedrooms': (1, 5),
+    'age': (1, 35),
+}
+
+# Códigos de error por fila (0 = válida)
+ERRORES = (
+    None,
+    "Valor ausente o no numérico",
+    "Tamaño debe estar entre 40 y 120 m²",
+    "Habitaciones debe estar entre 1 y 5",
+    "Edad debe estar entre 1 y 35 años",
+)
+
+# Artefacto del modelo fusionado: [intercepto, w_size, w_bedrooms, w_age]
+FUSED_FILENAME = 'modelo_fusionado.npy'
+
+# Tabla densa de precios para entradas enteras, float32 de forma (81, 5, 35)
+TABLE_FILENAME = 'tabla_precios.npy'
+
+# Intervalos de predicción: [n, σ², t90, t95, media (3), Cxx⁻¹ (3×3)]
+INTERVALS_FILENAME = 'intervalos.npy'
+
+# Metadatos del modelo (métricas, coeficientes, rangos) en JSON
+METADATA_FILENAME = 'metadata.json'
+
+# Niveles de los intervalos de predicción servidos por la API
+NIVELES = ('90', '95')
+
+# Máximo de filas por petición para no agotar la memoria del worker
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+
+
+class BatchError(ValueError):
+    """Payload de lote inválido en su conjunto (no por fila)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _columna(valores):
+    """Convertir una lista a float64; los valores no numéricos o anidados quedan como NaN"""
+    try:
+        columna = np.asarray(valores, dtype=np.float64)
+        if columna.ndim == 1:
+            return columna
+    except (TypeError, ValueError):
+        pass
+    # Fila a fila: float() rechaza listas anidadas, que así son filas inválidas
+    columna = np.empty(len(valores), dtype=np.float64)
+    for i, v in enumerate(valores):
+        try:
+            columna[i] = float(v)
+        except (TypeError, ValueError):
+            columna[i] = np.nan
+    return columna
+
+
+def parse_batch(data, max_batch_size=None):
+    """
+    Convertir el payload JSON en una matriz (n, 3) de float64
+
+    Acepta una lista de objetos [{"size": .., "bedrooms": .., "age": ..}, ...]
+    o un payload columnar {"size": [...], "bedrooms": [...], "age": [...]}.
+    """
+    max_batch_size = MAX_BATCH_SIZE if max_batch_size is None else max_batch_size
+
+    if isinstance(data, list):
+        n = len(data)
+        if n > max_batch_size:
+            raise BatchError(f"El lote excede el máximo de {max_batch_size} filas", 413)
+        filas = [fila if isinstance(fila, dict) else {} for fila in data]
+        columnas = [_columna([fila.get(col) for fila in filas]) for col in FEATURES]
+    elif isinstance(data, dict):
+        faltantes = [col for col in FEATURES if not isinstance(data.get(col), list)]
+        if faltantes:
+            raise BatchError(f"Faltan columnas en el payload: {faltantes}")
+        n = len(data['size'])
+        if any(len(data[col]) != n for col in FEATURES):
+            raise BatchError("Las columnas deben tener la misma longitud")
+        if n > max_batch_size:
+            raise BatchError(f"El lote excede el máximo de {max_batch_size} filas", 413)
+        columnas = [_columna(data[col]) for col in FEATURES]
+    else:
+        raise BatchError("Se esperaba una lista de objetos o columnas paralelas")
+
+    X = np.column_stack(columnas) if n else np.empty((0, len(FEATURES)))
+    # Habitaciones y edad son enteras, como en /api/predict
+    X[:, 1:] = np.trunc(X[:, 1:])
+    return X
+
+
+def validate_batch(X):
+    """Código de error por fila (índice en ERRORES); 0 indica fila válida"""
+    codigos = np.zeros(len(X), dtype=np.int8)
+    # Se asigna en orden inverso para que prevalezca el primer error
+    for codigo, col in ((4, 2), (3, 1), (2, 0)):
+        bajo, alto = RANGOS[FEATURES[col]]
+        codigos[(X[:, col] < bajo) | (X[:, col] > alto)] = codigo
+    codigos[np.isnan(X).any(axis=1)] = 1
+    return codigos
+
+
+class FusedLinearModel:
+    """
+    Regresión lineal con el StandardScaler plegado en los coeficientes
+
+    Con z = (x - media) / escala y precio = coef · z + b, los pesos efectivos
+    en unidades originales son coef / escala y el intercepto
+    b - coef · media / escala. Predecir es un producto escalar, sin sklearn.
+    """
+
+    __slots__ = ('pesos', 'intercepto', '_w', '_b')
+
+    def __init__(self, pesos, intercepto):
+        # asarray no copia un memmap float64: se conserva el mapeo compartido
+        self.pesos = np.asarray(pesos, dtype=np.float64)
+        self.intercepto = float(intercepto)
+        # Copias como float de Python para la ruta escalar
+        self._w = tuple(self.pesos.tolist())
+        self._b = self.intercepto
+
+    @classmethod
+    def from_sklearn(cls, modelo, scaler):
+        """Plegar un StandardScaler + LinearRegression entrenados"""
+        coef = np.asarray(modelo.coef_, dtype=np.float64).ravel()
+        media = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else 0.0
+        escala = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else 1.0
+        pesos = coef / escala
+        intercepto = float(np.ravel(modelo.intercept_)[0]) - float(np.dot(pesos, media))
+        return cls(pesos, intercepto)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """
+        Leer el artefacto .npy; con `mmap` los pesos quedan mapeados en
+        memoria y los workers creados con fork comparten las mismas páginas
+        """
+        datos = np.load(path, mmap_mode='r' if mmap else None)
+        return cls(datos[1:], datos[0])
+
+    def save(self, path):
+        # Formato .npy plano: se puede leer sin sklearn ni pickle
+        with atomic_path(path) as tmp, open(tmp, 'wb') as f:
+            np.save(f, np.concatenate(([self.intercepto], self.pesos)), allow_pickle=False)
+
+    def predict_one(self, size, bedrooms, age):
+        """Predicción escalar con floats de Python (~1 µs)"""
+        w0, w1, w2 = self._w
+        return self._b + w0 * size + w1 * bedrooms + w2 * age
+
+    def predict(self, X):
+        """Predicción vectorizada sobre una matriz (n, 3)"""
+        return X @ self.pesos + self.intercepto
+
+
+class PredictionIntervals:
+    """
+    Intervalos de predicción de la regresión lineal sin datos de entrenamiento
+
+    Con la varianza residual σ², las medias x̄ y Cxx⁻¹ = (Σ(x-x̄)(x-x̄)ᵀ)⁻¹
+    del entrenamiento, el intervalo de nivel 1-α para una fila x es
+    ŷ ± t(α/2, n-p-1) · σ · √(1 + 1/n + (x-x̄)ᵀ Cxx⁻¹ (x-x̄)): una forma
+    cuadrática 3×3 por fila. Los cuantiles t se calculan al entrenar.
+    """
+
+    __slots__ = ('n', 'sigma2', 't', 'media', 'cxx_inv', '_escalar')
+
+    def __init__(self, n, sigma2, t, media, cxx_inv):
+        self.n = float(n)
+        self.sigma2 = float(sigma2)
+        self.t = np.asarray(t, dtype=np.float64)
+        self.media = np.asarray(media, dtype=np.float64)
+        self.cxx_inv = np.asarray(cxx_inv, dtype=np.float64).reshape(len(self.media), -1)
+        # Floats de Python para la ruta escalar (solo la mitad superior de Cxx⁻¹)
+        c = self.cxx_inv
+        self._escalar = (tuple(self.media.tolist()), c[0, 0], c[1, 1], c[2, 2],
+                         2 * c[0, 1], 2 * c[0, 2], 2 * c[1, 2], 1 + 1 / self.n,
+                         tuple(self.t.tolist()), self.sigma2)
+
+    @classmethod
+    def from_statistics(cls, n, media, cxx, sse):
+        """A partir de n, x̄, Cxx y la suma de residuos al cuadrado del ajuste"""
+        from scipy.stats import t as student_t
+
+        gl = n - len(media) - 1
+        if gl <= 0:
+            raise ValueError(f"Faltan filas para estimar la varianza residual (n={n})")
+        t = [student_t.ppf(1 - (1 - int(nivel) / 100) / 2, gl) for nivel in NIVELES]
+        return cls(n, sse / gl, t, media, np.linalg.pinv(cxx))
+
+    @classmethod
+    def load(cls, path):
+        datos = np.load(path)
+        k = len(NIVELES)
+        return cls(datos[0], datos[1], datos[2:2 + k], datos[2 + k:5 + k], datos[5 + k:])
+
+    def save(self, path):
+        with atomic_path(path) as tmp, open(tmp, 'wb') as f:
+            np.save(f, np.concatenate(([self.n, self.sigma2], self.t, self.media,
+                                       self.cxx_inv.ravel())), allow_pickle=False)
+
+    def half_widths_one(self, size, bedrooms, age):
+        """Semiamplitud de cada nivel para una fila, con floats de Python"""
+        (m0, m1, m2), c00, c11, c22, c01, c02, c12, base, t, sigma2 = self._escalar
+        d0, d1, d2 = size - m0, bedrooms - m1, age - m2
+        q = (c00 * d0 * d0 + c11 * d1 * d1 + c22 * d2 * d2
+             + c01 * d0 * d1 + c02 * d0 * d2 + c12 * d1 * d2)
+        se = math.sqrt(sigma2 * (base + q))
+        return tuple(ti * se for ti in t)
+
+    def half_widths(self, X):
+        """Semiamplitudes (n, niveles) para una matriz (n, 3)"""
+        Xc = X - self.media
+        q = np.einsum('ij,jk,ik->i', Xc, self.cxx_inv, Xc)
+        return np.sqrt(self.sigma2 * (1 + 1 / self.n + q))[:, None] * self.t
+
+
+def table_axes():
+    """Valores enteros de cada variable dentro de su rango válido"""
+    return [np.arange(bajo, alto + 1, dtype=np.float64) for bajo, alto in RANGOS.values()]
+
+
+def build_lookup_table(modelo, scaler):
+    """Precio para cada celda de la rejilla entera de entradas (float32)"""
+    ejes = table_axes()
+    X = np.stack(np.meshgrid(*ejes, indexing='ij'), axis=-1).reshape(-1, len(FEATURES))
+    return predict_batch(modelo, scaler, X).astype(np.float32).reshape([len(e) for e in ejes])
+
+
+def save_lookup_table(tabla, path):
+    with atomic_path(path) as tmp, open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(tabla, dtype=np.float32), allow_pickle=False)
+
+
+class TabulatedModel:
+    """
+    Tabla de precios precalculada delante del modelo fusionado
+
+    Las peticiones con las tres entradas enteras se resuelven indexando la
+    tabla (mapeada en memoria); el resto, y los lotes, usan el modelo
+    fusionado. La tabla es float32: difiere del cálculo exacto en ~1e-5.
+    """
+
+    __slots__ = ('tabla', 'fallback', '_origen', '_forma', '_plana')
+
+    def __init__(self, tabla, fallback):
+        self.tabla = tabla
+        self.fallback = fallback
+        self._origen = tuple(int(bajo) for bajo, _ in RANGOS.values())
+        self._forma = tabla.shape
+        # Vista plana sobre el mismo buffer: indexar un memoryview devuelve un
+        # float de Python sin crear escalares de NumPy
+        self._plana = memoryview(np.ascontiguousarray(tabla).reshape(-1))
+
+    @classmethod
+    def load(cls, path, fallback, mmap=True):
+        tabla = np.load(path, mmap_mode='r' if mmap else None)
+        if tabla.shape != tuple(len(e) for e in table_axes()):
+            raise ValueError(f"Tabla de precios con forma inesperada {tabla.shape}")
+        return cls(tabla, fallback)
+
+    @property
+    def pesos(self):
+        return self.fallback.pesos
+
+    @property
+    def intercepto(self):
+        return self.fallback.intercepto
+
+    def predict_one(self, size, bedrooms, age):
+        s0, b0, a0 = self._origen
+        n_s, n_b, n_a = self._forma
+        i = int(size) - s0
+        j = int(bedrooms) - b0
+        k = int(age) - a0
+        if (i == size - s0 and j == bedrooms - b0 and k == age - a0
+                and 0 <= i < n_s and 0 <= j < n_b and 0 <= k < n_a):
+            return self._plana[(i * n_b + j) * n_a + k]
+        return self.fallback.predict_one(size, bedrooms, age)
+
+    def predict(self, X):
+        # En lotes el producto matricial ya es O(1) por fila y exacto
+        return self.fallback.predict(X)
+
+
+def _grid_paridad():
+    """Puntos de control dentro de los rangos válidos"""
+    ejes = [np.linspace(bajo, alto, 5) for bajo, alto in RANGOS.values()]
+    return np.stack(np.meshgrid(*ejes, indexing='ij'), axis=-1).reshape(-1, len(FEATURES))
+
+
+def check_parity(engine, modelo, scaler, X=None, atol=1e-6):
+    """
+    Comparar el modelo fusionado con la ruta sklearn
+
+    Devuelve la diferencia absoluta máxima y lanza ValueError si supera `atol`.
+    """
+    X = _grid_paridad() if X is None else np.asarray(X, dtype=np.float64)
+    diferencia = float(np.max(np.abs(engine.predict(X) - predict_batch(modelo, scaler, X))))
+    if not diferencia <= atol:
+        raise ValueError(f"El modelo fusionado difiere de sklearn en {diferencia:.3g}")
+    return diferencia
+
+
+def check_table(tabulado, atol=1e-3):
+    """Comparar la tabla completa con el modelo fusionado (tolerancia float32)"""
+    ejes = table_axes()
+    X = np.stack(np.meshgrid(*ejes, indexing='ij'), axis=-1).reshape(-1, len(FEATURES))
+    exacto = tabulado.fallback.predict(X).reshape(tabulado.tabla.shape)
+    diferencia = float(np.max(np.abs(tabulado.tabla - exacto)))
+    if not diferencia <= atol:
+        raise ValueError(f"La tabla de precios difiere del modelo en {diferencia:.3g}")
+    return diferencia
+
+
+def predict_batch(modelo, scaler, X):
+    """Ruta de referencia con sklearn: una sola llamada a cada objeto"""
+    if len(X) == 0:
+        return np.empty(0)
+    with warnings.catch_warnings():
+        # El scaler se ajustó con un DataFrame; aquí se usan arrays sin nombres
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        return modelo.predict(scaler.transform(X))
+
+
+def score_batch(engine, X):
+    """Validar y predecir un lote; devuelve (predicciones con NaN, códigos)"""
+    codigos = validate_batch(X)
+    validas = codigos == 0
+    predicciones = np.full(len(X), np.nan)
+    predicciones[validas] = engine.predict(X[validas])
+    return predicciones, codigos
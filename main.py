@@ -3,8 +3,14 @@
 Punto de entrada para Render
 """
 
-from app import app as flask_app
-from asgiref.wsgi import WsgiToAsgi
+import os
 
-# Convertir aplicación Flask (WSGI) a ASGI y exportar como 'app'
-app = WsgiToAsgi(flask_app)
+if os.environ.get('SERVING_MODE', 'asgi') == 'wsgi':
+    # Aplicación Flask (WSGI) convertida a ASGI con el puente de asgiref
+    from app import app as flask_app
+    from asgiref.wsgi import WsgiToAsgi
+
+    app = WsgiToAsgi(flask_app)
+else:
+    # Aplicación ASGI nativa (mismas rutas y contratos JSON)
+    from asgi_app import app
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Métricas del servicio en el formato de texto de Prometheus
+Histogramas de latencia por ruta y por fase de la petición, peticiones en
+curso y contadores por código de estado. Registrar una fase solo anota
+(fase, ns) en la petición; los histogramas se actualizan al terminarla,
+con un único lock, de modo que se puede dejar activo en producción
+"""
+
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+
+# Límites de los buckets en segundos: de 1 µs a 10 s
+BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+_LIMITES_NS = tuple(round(b * 1e9) for b in BUCKETS)
+
+CONTENT_TYPE = b'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histograma:
+    """Cuentas por bucket (no acumuladas) y suma en nanosegundos; sin lock propio"""
+
+    __slots__ = ('cuentas', 'suma_ns')
+
+    def __init__(self):
+        # El último bucket es +Inf
+        self.cuentas = [0] * (len(_LIMITES_NS) + 1)
+        self.suma_ns = 0
+
+    def observar_ns(self, ns):
+        self.cuentas[bisect_left(_LIMITES_NS, ns)] += 1
+        self.suma_ns += ns
+
+    def copia(self):
+        h = Histograma()
+        h.cuentas = list(self.cuentas)
+        h.suma_ns = self.suma_ns
+        return h
+
+    def lineas(self, nombre, etiquetas):
+        """Líneas _bucket/_sum/_count con buckets acumulados"""
+        acumulado = 0
+        for limite, cuenta in zip(BUCKETS + ('+Inf',), self.cuentas):
+            acumulado += cuenta
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma_ns / 1e9:.9f}'
+        yield f'{nombre}_count{{{etiquetas}}} {acumulado}'
+
+
+class _Ruta:
+    """Métricas de un (método, ruta)"""
+
+    __slots__ = ('en_curso', 'duracion', 'fases', 'estados')
+
+    def __init__(self):
+        self.en_curso = 0
+        self.duracion = Histograma()
+        self.fases = {}
+        self.estados = {}
+
+
+class Peticion:
+    """
+    Cronómetro de una petición: cada fase(nombre) anota el tramo desde la
+    fase anterior (o el inicio); terminar() lo vuelca todo en los
+    histogramas con un único lock
+    """
+
+    __slots__ = ('_metricas', '_ruta', '_fases', 'inicio', 'status', '_ultima')
+
+    def __init__(self, metricas, ruta):
+        self._metricas = metricas
+        self._ruta = ruta
+        self._fases = []
+        self.status = 500
+        self.inicio = self._ultima = perf_counter_ns()
+
+    def fase(self, nombre):
+        t = perf_counter_ns()
+        self._fases.append((nombre, t - self._ultima))
+        self._ultima = t
+
+    def terminar(self, status=None):
+        self._metricas.terminar(self._ruta, perf_counter_ns() - self.inicio, self._fases,
+                                self.status if status is None else status)
+
+
+class _SinMedir:
+    """Peticion que no registra nada (llamadas fuera de una petición HTTP)"""
+
+    __slots__ = ()
+    status = None
+
+    def fase(self, nombre):
+        pass
+
+    def terminar(self, status=None):
+        pass
+
+
+SIN_MEDIR = _SinMedir()
+
+
+def _etiquetas(ruta, **valores):
+    metodo, plantilla = ruta
+    return ','.join(f'{k}="{v}"' for k, v in
+                    dict(method=metodo, route=plantilla, **valores).items())
+
+
+def _valor(valor):
+    return f'{valor:.9g}' if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """
+    Registro de métricas del proceso
+
+    Las métricas de otros componentes (caché, registro del modelo) se
+    leen al exportar mediante colectores: funciones que devuelven
+    (nombre, tipo, ayuda, [(etiquetas, valor), ...]).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rutas = {}
+        self._colectores = []
+
+    def iniciar(self, metodo, ruta):
+        """Peticion para `ruta` (plantilla de la ruta, no la URL con parámetros)"""
+        with self._lock:
+            datos = self._rutas.get((metodo, ruta))
+            if datos is None:
+                datos = self._rutas[(metodo, ruta)] = _Ruta()
+            datos.en_curso += 1
+        return Peticion(self, datos)
+
+    def terminar(self, datos, ns, fases, status):
+        with self._lock:
+            datos.en_curso -= 1
+            datos.estados[status] = datos.estados.get(status, 0) + 1
+            datos.duracion.observar_ns(ns)
+            for nombre, ns in fases:
+                h = datos.fases.get(nombre)
+                if h is None:
+                    h = datos.fases[nombre] = Histograma()
+                h.observar_ns(ns)
+
+    def registrar_colector(self, colector):
+        self._colectores.append(colector)
+
+    def exportar(self):
+        """Todas las métricas en el formato de texto de Prometheus (bytes)"""
+        with self._lock:
+            rutas = [(ruta, datos.en_curso, datos.duracion.copia(), dict(datos.estados),
+                      {fase: h.copia() for fase, h in datos.fases.items()})
+                     for ruta, datos in sorted(self._rutas.items())]
+
+        lineas = [
+            '# HELP http_request_duration_seconds Latencia total de la petición por ruta',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for ruta, _, duracion, _, _ in rutas:
+            lineas.extend(duracion.lineas('http_request_duration_seconds', _etiquetas(ruta)))
+        lineas += [
+            '# HELP http_request_phase_seconds Latencia de cada fase de la petición por ruta',
+            '# TYPE http_request_phase_seconds histogram',
+        ]
+        for ruta, _, _, _, fases in rutas:
+            for fase, h in sorted(fases.items()):
+                lineas.extend(h.lineas('http_request_phase_seconds', _etiquetas(ruta, phase=fase)))
+        lineas += [
+            '# HELP http_requests_total Peticiones terminadas por ruta y código de estado',
+            '# TYPE http_requests_total counter',
+        ]
+        for ruta, _, _, estados, _ in rutas:
+            lineas += [f'http_requests_total{{{_etiquetas(ruta, status=status)}}} {n}'
+                       for status, n in sorted(estados.items())]
+        lineas += [
+            '# HELP http_requests_in_flight Peticiones en curso por ruta',
+            '# TYPE http_requests_in_flight gauge',
+        ]
+        lineas += [f'http_requests_in_flight{{{_etiquetas(ruta)}}} {en_curso}'
+                   for ruta, en_curso, _, _, _ in rutas]
+
+        for colector in self._colectores:
+            for nombre, tipo, ayuda, muestras in colector():
+                lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+                for etiquetas, valor in muestras:
+                    lineas.append(f'{nombre}{{{etiquetas}}} {_valor(valor)}' if etiquetas
+                                  else f'{nombre} {_valor(valor)}')
+        return ('\n'.join(lineas) + '\n').encode()
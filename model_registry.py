@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Registro de modelos para el servicio de predicción
+Carga el modelo y el scaler una sola vez por proceso y detecta cambios
+en los artefactos mediante mtime/tamaño y hash del contenido. Con
+artefactos versionados sigue el manifiesto: un hilo lo vigila, carga y
+precalienta la versión nueva en segundo plano y la publica de golpe
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from artifact_store import MANIFEST_FILENAME, file_lock, read_manifest
+from inference import (
+    FUSED_FILENAME, INTERVALS_FILENAME, METADATA_FILENAME, RANGOS, TABLE_FILENAME,
+    FusedLinearModel, PredictionIntervals, TabulatedModel, check_parity, check_table, validate_batch,
+)
+
+
+class _ParSklearn:
+    """
+    Modelo y scaler de sklearn deserializados solo cuando se piden
+
+    Se guardan los bytes leídos al cargar la versión, de modo que el par
+    siempre corresponde al motor fusionado del mismo handle. Importar
+    sklearn cuesta segundos y la ruta de predicción no lo necesita.
+    """
+
+    def __init__(self, contenidos):
+        self._contenidos = contenidos
+        self._par = None
+        self._lock = threading.Lock()
+
+    def cargar(self):
+        if self._par is None:
+            with self._lock:
+                if self._par is None:
+                    import joblib
+                    self._par = tuple(joblib.load(io.BytesIO(c)) for c in self._contenidos)
+                    self._contenidos = None
+        return self._par
+
+
+@dataclass(frozen=True)
+class ModelHandle:
+    """Referencia inmutable al modelo cargado, compartida entre peticiones"""
+    engine: FusedLinearModel
+    version: str
+    loaded_at: float
+    firma: tuple
+    sklearn: _ParSklearn = field(repr=False)
+    # Directorio de los artefactos ('v<N>' o '.' sin manifiesto)
+    origen: str = '.'
+    # Intervalos de predicción (None si el entrenamiento no los exportó)
+    intervalos: PredictionIntervals = None
+    # Metadatos del entrenamiento de esta versión (métricas, coeficientes...)
+    metadatos: dict = field(default=None, repr=False)
+
+    @property
+    def modelo(self):
+        return self.sklearn.cargar()[0]
+
+    @property
+    def scaler(self):
+        return self.sklearn.cargar()[1]
+
+
+def _firma(paths):
+    """(mtime_ns, tamaño) de cada artefacto, o None si falta alguno"""
+    try:
+        return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, paths))
+    except FileNotFoundError:
+        return None
+
+
+def _leer_artefactos(paths):
+    """(hash SHA-256 combinado, contenido de cada artefacto)"""
+    h = hashlib.sha256()
+    contenidos = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contenidos.append(f.read())
+        h.update(contenidos[-1])
+    return h.hexdigest()[:12], contenidos
+
+
+class ModelRegistry:
+    """
+    Registro de proceso para el modelo y el scaler
+
+    get() devuelve siempre el mismo ModelHandle mientras los artefactos no
+    cambien. Como mucho cada `check_interval` segundos se comprueba el
+    mtime/tamaño de los ficheros; si cambian, se compara el hash del
+    contenido y solo se recarga cuando es distinto.
+
+    Si hay manifiesto, los ficheros se buscan en la versión a la que apunta.
+    Con watch() la comprobación la hace un hilo en segundo plano y get() no
+    toca nunca el disco: las peticiones en curso terminan con el handle que
+    ya tenían y las siguientes ven el nuevo, ya precalentado.
+    """
+
+    def __init__(self, model_path, scaler_path, check_interval=1.0, use_table=False):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.check_interval = check_interval
+        self.use_table = use_table
+        self._nombres = (os.path.basename(model_path), os.path.basename(scaler_path))
+        self._dir = os.path.dirname(model_path) or '.'
+        self._handle = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.warmed_version = None
+        self.warmup_ms = None
+        self.loads = 0
+        self.load_ms = None
+        self._listeners = []
+        self._vigilante = None
+        self._parar = threading.Event()
+        self._fork_registrado = False
+
+    @property
+    def current(self):
+        """Handle cargado actualmente (sin tocar el disco)"""
+        return self._handle
+
+    def subscribe(self, callback):
+        """Registrar callback(handle) que se invoca al publicar un modelo nuevo"""
+        self._listeners.append(callback)
+
+    def status(self):
+        """Estado del registro en memoria (para sondas de readiness)"""
+        handle = self._handle
+        return {
+            'model_loaded': handle is not None,
+            'version': handle.version if handle is not None else None,
+            'loaded_at': handle.loaded_at if handle is not None else None,
+            'warmed_up': handle is not None and self.warmed_version == handle.version,
+            'warmup_ms': self.warmup_ms,
+            'loads': self.loads,
+            'load_ms': self.load_ms,
+            'artifacts': handle.origen if handle is not None else None,
+            'watching': self.watching,
+        }
+
+    def _origen(self):
+        """Directorio de la versión publicada ('.' sin manifiesto)"""
+        try:
+            manifiesto = read_manifest(self._dir)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  No se pudo leer {MANIFEST_FILENAME}: {e}")
+            manifiesto = None
+        return manifiesto['path'] if manifiesto is not None else '.'
+
+    def paths(self, origen=None):
+        """Rutas del modelo y el scaler de la versión publicada"""
+        directorio = os.path.join(self._dir, origen or self._origen())
+        return tuple(os.path.normpath(os.path.join(directorio, n)) for n in self._nombres)
+
+    def get(self):
+        """Devolver el handle actual, recargando si los artefactos cambiaron"""
+        handle = self._handle
+        if handle is not None and (self._vigilante is not None or
+                                   time.monotonic() - self._last_check < self.check_interval):
+            return handle
+        return self.check()
+
+    def check(self):
+        """Comprobar los artefactos en disco y cargar la versión nueva si cambió"""
+        with self._lock:
+            handle = self._handle
+            self._last_check = time.monotonic()
+            origen = self._origen()
+            firma = _firma(self.paths(origen))
+            if firma is None:
+                return handle
+            if handle is not None and firma == handle.firma and origen == handle.origen:
+                return handle
+            return self._load(origen, firma)
+
+    def reload(self):
+        """Forzar la lectura de los artefactos desde disco"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            origen = self._origen()
+            firma = _firma(self.paths(origen))
+            if firma is None:
+                return self._handle
+            return self._load(origen, firma, force=True)
+
+    @property
+    def watching(self):
+        return self._vigilante is not None
+
+    def watch(self, interval=None):
+        """
+        Vigilar los artefactos desde un hilo cada `interval` segundos (por
+        defecto check_interval); tras un fork el hilo se relanza en el hijo
+        """
+        if interval is not None:
+            self.check_interval = interval
+        if self._vigilante is not None:
+            return
+        if not self._fork_registrado and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._relanzar_tras_fork)
+            self._fork_registrado = True
+        self._parar = threading.Event()
+        self._vigilante = threading.Thread(target=self._vigilar, args=(self._parar,),
+                                           name='model-watcher', daemon=True)
+        self._vigilante.start()
+
+    def stop_watching(self):
+        """Detener el hilo de vigilancia; get() vuelve a comprobar el disco"""
+        vigilante, self._vigilante = self._vigilante, None
+        if vigilante is not None:
+            self._parar.set()
+            vigilante.join(timeout=5)
+
+    def _relanzar_tras_fork(self):
+        # El hilo del padre no existe en el hijo; los locks pueden haber
+        # quedado tomados por él
+        if self._vigilante is not None:
+            self._lock = threading.Lock()
+            self._vigilante = None
+            self.watch()
+
+    def _vigilar(self, parar):
+        while not parar.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Una versión que no carga no sustituye a la actual
+                print(f"❌ Error cargando la versión nueva del modelo: {e}")
+
+    def _load(self, origen, firma, force=False):
+        t0 = time.perf_counter()
+        directorio = os.path.normpath(os.path.join(self._dir, origen))
+        paths = self.paths(origen)
+        # Bloqueo compartido: nunca leer mientras otro proceso escribe el par
+        with file_lock(self._dir, shared=True):
+            firma = _firma(paths) or firma
+            version, contenidos = _leer_artefactos(paths)
+            handle = self._handle
+            if not force and handle is not None and version == handle.version:
+                # Mismo contenido (p. ej. un `touch`): solo actualizar la firma
+                self._handle = ModelHandle(handle.engine, version, handle.loaded_at, firma,
+                                           handle.sklearn, origen, handle.intervalos,
+                                           handle.metadatos)
+                return self._handle
+
+            sklearn = _ParSklearn(contenidos)
+            engine = self._load_engine(directorio, sklearn, firma)
+            intervalos = self._load_intervals(directorio, firma)
+            metadatos = self._load_metadata(directorio, version)
+
+        handle = ModelHandle(engine, version, time.time(), firma, sklearn, origen, intervalos,
+                             metadatos)
+        # Precalentar antes de publicar: ninguna petición ve un modelo a medio cargar
+        self._warm_up(handle)
+        self._handle = handle
+        self.loads += 1
+        self.load_ms = round((time.perf_counter() - t0) * 1000, 3)
+        print(f"✅ Modelo cargado desde {directorio}/ (versión {version})")
+        for callback in self._listeners:
+            callback(handle)
+        return self._handle
+
+    def _load_engine(self, directorio, sklearn, firma):
+        """
+        Modelo fusionado (y tabla de precios) exportados en el entrenamiento
+
+        El entrenamiento comprueba la paridad al exportar el artefacto
+        fusionado, así que si está al día se usa sin deserializar sklearn;
+        si falta o es más antiguo que el modelo, se compila desde sklearn.
+        """
+        fused_path = os.path.join(directorio, FUSED_FILENAME)
+        engine = None
+        try:
+            # Un artefacto fusionado más antiguo que el modelo está obsoleto
+            if os.stat(fused_path).st_mtime_ns >= firma[0][0]:
+                engine = FusedLinearModel.load(fused_path, mmap=True)
+        except (OSError, ValueError):
+            engine = None
+        if engine is None:
+            modelo, scaler = sklearn.cargar()
+            engine = FusedLinearModel.from_sklearn(modelo, scaler)
+            check_parity(engine, modelo, scaler)
+
+        if not self.use_table:
+            return engine
+        table_path = os.path.join(directorio, TABLE_FILENAME)
+        try:
+            if os.stat(table_path).st_mtime_ns >= firma[0][0]:
+                tabulado = TabulatedModel.load(table_path, engine, mmap=True)
+                check_table(tabulado)
+                return tabulado
+        except (OSError, ValueError):
+            pass
+        return engine
+
+    def _load_intervals(self, directorio, firma):
+        """Intervalos de predicción exportados junto al modelo, si están al día"""
+        path = os.path.join(directorio, INTERVALS_FILENAME)
+        try:
+            if os.stat(path).st_mtime_ns >= firma[0][0]:
+                return PredictionIntervals.load(path)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _load_metadata(self, directorio, version):
+        """Metadatos de la versión; se descartan si su hash no es el del modelo cargado"""
+        try:
+            with open(os.path.join(directorio, METADATA_FILENAME), 'rb') as f:
+                metadatos = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(metadatos, dict) or metadatos.get('artifact_hash') != version:
+            print(f"⚠️  {METADATA_FILENAME} no corresponde al modelo cargado; se ignora")
+            return None
+        return metadatos
+
+    def warm_up(self):
+        """Precalentar el handle actual en este proceso (p. ej. tras un fork)"""
+        handle = self._handle
+        if handle is not None:
+            self._warm_up(handle)
+        return handle
+
+    def _warm_up(self, handle):
+        """Ejercitar las rutas de predicción antes de publicar el handle"""
+        t0 = time.perf_counter()
+        X = np.array(list(RANGOS.values()), dtype=np.float64).T
+        validate_batch(X)
+        handle.engine.predict(X)
+        for fila in X.tolist():
+            handle.engine.predict_one(*fila)
+        if handle.intervalos is not None:
+            handle.intervalos.half_widths(X)
+            handle.intervalos.half_widths_one(*X[0].tolist())
+        self.warmup_ms = round((time.perf_counter() - t0) * 1000, 3)
+        self.warmed_version = handle.version
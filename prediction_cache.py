@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Caché LRU/TTL acotada para predicciones individuales
+Las claves incluyen la versión del modelo y las entradas normalizadas
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Caché LRU con expiración opcional y contadores de aciertos/fallos
+
+    `maxsize=0` la desactiva; `ttl=None` conserva las entradas hasta que
+    se desalojan por tamaño o se vacía la caché.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(version, size, bedrooms, age):
+        """Clave exacta: 40 y 40.0 comparten entrada, 39.9999 no"""
+        return (version, float(size), int(bedrooms), int(age))
+
+    def get(self, key):
+        """Valor cacheado o None"""
+        if not self.maxsize:
+            return None
+        with self._lock:
+            entrada = self._data.get(key)
+            if entrada is None:
+                self.misses += 1
+                return None
+            valor, expira = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def put(self, key, valor):
+        if not self.maxsize:
+            return
+        expira = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (valor, expira)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *_):
+        """Vaciar la caché (se usa como listener de recarga del modelo)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Puntuación masiva offline: CSV/Parquet de entrada, predicciones de salida
+Lee el fichero por bloques, valida y predice cada bloque con NumPy
+(inference.score_batch) y escribe los resultados a medida que avanza, de
+modo que la memoria no depende del tamaño del fichero
+
+De CSV a CSV cada línea de entrada se copia tal cual y solo se formatean
+las dos columnas nuevas: reescribir todas las columnas con
+DataFrame.to_csv costaba varias veces más que leer y predecir.
+
+Con `jobs > 1` la entrada se divide en partes (rangos de bytes del CSV o
+grupos de filas del Parquet); cada proceso escribe su parte en un fichero
+temporal y el proceso principal las concatena en orden.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import atomic_path
+from entrenamiento_streaming import (
+    CHUNKSIZE, leer_cabecera, leer_csv_por_bloques, leer_lineas_por_bloques, particionar,
+)
+from inference import ERRORES, FEATURES, score_batch
+
+# Columnas añadidas a cada fila de la salida
+COLUMNA_PRECIO = 'precio_predicho'
+COLUMNA_ERROR = 'codigo_error'
+
+# Decimales del precio predicho (miles $), los mismos que /api/predict
+DECIMALES = 2
+
+
+def es_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def _pyarrow():
+    """(pyarrow, pyarrow.parquet); pyarrow solo hace falta para Parquet"""
+    try:
+        import pyarrow
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Leer o escribir Parquet requiere pyarrow (pip install pyarrow)") from None
+    return pyarrow, pq
+
+
+def ruta_salida_por_defecto(entrada):
+    base, ext = os.path.splitext(entrada)
+    return f'{base}_predicciones{ext or ".csv"}'
+
+
+def columnas_entrada(path):
+    if es_parquet(path):
+        _, pq = _pyarrow()
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return leer_cabecera(path)[0]
+
+
+def particionar_entrada(path, partes):
+    """Rangos de bytes (CSV) o listas de grupos de filas (Parquet); [None] = todo"""
+    if partes <= 1:
+        return [None]
+    if es_parquet(path):
+        _, pq = _pyarrow()
+        grupos = np.array_split(np.arange(pq.ParquetFile(path).num_row_groups), partes)
+        return [g.tolist() for g in grupos if len(g)] or [None]
+    return particionar(path, partes) or [None]
+
+
+def leer_entrada(path, chunksize=CHUNKSIZE, parte=None):
+    """DataFrames de hasta `chunksize` filas de un CSV o Parquet"""
+    if es_parquet(path):
+        _, pq = _pyarrow()
+        for lote in pq.ParquetFile(path).iter_batches(batch_size=chunksize, row_groups=parte):
+            yield lote.to_pandas()
+    else:
+        yield from leer_csv_por_bloques(path, chunksize, parte)
+
+
+def matriz_features(df):
+    """Matriz float64 (n, 3) de size/bedrooms/age; no numéricos → NaN"""
+    X = np.column_stack([pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+                         for col in FEATURES])
+    # Habitaciones y edad son enteras, como en /api/predict
+    X[:, 1:] = np.trunc(X[:, 1:])
+    return X
+
+
+def puntuar_matriz(motor, X):
+    """(precios redondeados con NaN en las filas inválidas, códigos de error)"""
+    precios, codigos = score_batch(motor, X)
+    return np.round(precios, DECIMALES), codigos
+
+
+def _cabecera_csv(columnas):
+    return pd.DataFrame(columns=columnas).to_csv(index=False).encode()
+
+
+def _lineas_puntuadas(lineas, precios, codigos):
+    """Cada línea de entrada seguida de ',precio,código' (precio vacío si no es válida)"""
+    valida = b'%%s,%%.%df,%%d\n' % DECIMALES
+    return b''.join([
+        valida % (linea.rstrip(b'\r\n'), precio, codigo) if not codigo
+        else b'%s,,%d\n' % (linea.rstrip(b'\r\n'), codigo)
+        for linea, precio, codigo in zip(lineas, precios.tolist(), codigos.tolist())
+    ])
+
+
+def _puntuar_lineas(entrada, parte, chunksize, motor, f):
+    """CSV → CSV: copiar las líneas de entrada añadiendo las columnas nuevas"""
+    cabecera = leer_cabecera(entrada)[0]
+    for lineas in leer_lineas_por_bloques(entrada, chunksize, parte):
+        # Las líneas vacías se descartan aquí, como en read_csv, para que
+        # cada fila del DataFrame corresponda a una línea de entrada
+        lineas = [linea for linea in lineas if linea.strip()]
+        if not lineas:
+            continue
+        df = pd.read_csv(io.BytesIO(b''.join(lineas)), header=None, names=cabecera,
+                         usecols=list(FEATURES), skip_blank_lines=False)
+        if len(df) != len(lineas):
+            raise ValueError("El CSV tiene saltos de línea entre comillas; "
+                             "use --salida .parquet")
+        precios, codigos = puntuar_matriz(motor, matriz_features(df))
+        f.write(_lineas_puntuadas(lineas, precios, codigos))
+        yield codigos
+
+
+def _puntuar_dataframes(entrada, parte, chunksize, motor, escribir):
+    """Ruta general (Parquet de entrada o de salida): DataFrame por bloque"""
+    for df in leer_entrada(entrada, chunksize, parte):
+        precios, codigos = puntuar_matriz(motor, matriz_features(df))
+        # Una entrada ya puntuada se vuelve a puntuar: las columnas van al final
+        df.drop(columns=[COLUMNA_PRECIO, COLUMNA_ERROR], errors='ignore', inplace=True)
+        df[COLUMNA_PRECIO] = precios
+        df[COLUMNA_ERROR] = codigos
+        escribir(df)
+        yield codigos
+
+
+class _EscritorParquet:
+    """
+    ParquetWriter con el esquema del primer bloque; size/bedrooms/age se
+    escriben como float64 (los no numéricos, nulos) para que el esquema
+    no cambie entre bloques
+    """
+
+    def __init__(self, path, columnas):
+        self.pa, self.pq = _pyarrow()
+        self._path = path
+        self._columnas = columnas
+        self._escritor = None
+
+    def escribir(self, df):
+        for col in FEATURES:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+        self.escribir_tabla(self.pa.Table.from_pandas(df, preserve_index=False))
+
+    def escribir_tabla(self, tabla):
+        if self._escritor is None:
+            self._escritor = self.pq.ParquetWriter(self._path, tabla.schema)
+        elif not tabla.schema.equals(self._escritor.schema):
+            try:
+                tabla = tabla.cast(self._escritor.schema)
+            except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"El tipo de las columnas cambia entre bloques: {e}") from None
+        self._escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self._escritor is None:
+            self.escribir(pd.DataFrame({col: pd.Series(dtype=np.float64)
+                                        for col in self._columnas}))
+        self._escritor.close()
+
+
+def _puntuar_parte(entrada, parte, chunksize, motor, destino, columnas, formato, cabecera):
+    """
+    Puntuar una parte de la entrada en `destino` con formato 'lineas',
+    'csv' o 'parquet'; devuelve el número de filas por código de error
+    """
+    conteo = np.zeros(len(ERRORES), dtype=np.int64)
+    if formato == 'parquet':
+        escritor = _EscritorParquet(destino, columnas)
+        try:
+            for codigos in _puntuar_dataframes(entrada, parte, chunksize, motor,
+                                               escritor.escribir):
+                conteo += np.bincount(codigos, minlength=len(ERRORES))
+        finally:
+            escritor.cerrar()
+        return conteo
+
+    with open(destino, 'wb') as f:
+        if cabecera:
+            f.write(_cabecera_csv(columnas))
+        if formato == 'lineas':
+            bloques = _puntuar_lineas(entrada, parte, chunksize, motor, f)
+        else:
+            bloques = _puntuar_dataframes(
+                entrada, parte, chunksize, motor,
+                lambda df: df.to_csv(f, header=False, index=False))
+        for codigos in bloques:
+            conteo += np.bincount(codigos, minlength=len(ERRORES))
+    return conteo
+
+
+def _unir_partes(partes, destino, columnas, formato):
+    """Concatenar en orden los ficheros de cada proceso"""
+    if formato == 'parquet':
+        escritor = _EscritorParquet(destino, columnas)
+        try:
+            for parte in partes:
+                for lote in escritor.pq.ParquetFile(parte).iter_batches():
+                    escritor.escribir_tabla(escritor.pa.Table.from_batches([lote]))
+        finally:
+            escritor.cerrar()
+        return
+    with open(destino, 'wb') as f:
+        f.write(_cabecera_csv(columnas))
+        for parte in partes:
+            with open(parte, 'rb') as origen:
+                shutil.copyfileobj(origen, f, 1 << 20)
+
+
+def puntuar_fichero(entrada, salida, motor, chunksize=CHUNKSIZE, jobs=1):
+    """
+    Escribir en `salida` cada fila de `entrada` con su precio predicho y su
+    código de error, en el mismo orden; el formato (CSV o Parquet) se
+    decide por la extensión de cada fichero
+
+    Devuelve el número de filas por código de error.
+    """
+    columnas = columnas_entrada(entrada)
+    faltantes = [col for col in FEATURES if col not in columnas]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en {entrada}: {faltantes}")
+    if es_parquet(salida):
+        formato = 'parquet'
+    elif es_parquet(entrada) or COLUMNA_PRECIO in columnas or COLUMNA_ERROR in columnas:
+        formato = 'csv'
+    else:
+        formato = 'lineas'
+    columnas = [c for c in columnas if c not in (COLUMNA_PRECIO, COLUMNA_ERROR)]
+    columnas += [COLUMNA_PRECIO, COLUMNA_ERROR]
+
+    print("\n" + "="*80)
+    print("PUNTUACIÓN MASIVA")
+    print("="*80)
+    partes = particionar_entrada(entrada, jobs)
+    print(f"📁 Puntuando {entrada} en bloques de {chunksize} filas"
+          + (f" ({len(partes)} partes en {jobs} procesos)" if len(partes) > 1 else ""))
+    t0 = time.perf_counter()
+
+    with atomic_path(salida) as tmp:
+        if len(partes) == 1:
+            conteo = _puntuar_parte(entrada, partes[0], chunksize, motor, tmp, columnas,
+                                    formato, True)
+        else:
+            directorio = tempfile.mkdtemp(dir=os.path.dirname(tmp), prefix='.puntuacion.')
+            try:
+                n = len(partes)
+                destinos = [os.path.join(directorio, f'parte_{i:04d}') for i in range(n)]
+                with ProcessPoolExecutor(jobs) as pool:
+                    conteo = sum(pool.map(_puntuar_parte, [entrada] * n, partes,
+                                          [chunksize] * n, [motor] * n, destinos,
+                                          [columnas] * n, [formato] * n, [False] * n))
+                _unir_partes(destinos, tmp, columnas, formato)
+            finally:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+    segundos = time.perf_counter() - t0
+    filas = int(conteo.sum())
+    print(f"✅ {filas} filas puntuadas en {segundos:.1f}s "
+          f"({filas / max(segundos, 1e-9):,.0f} filas/s)")
+    print(f"   • Válidas: {int(conteo[0])}")
+    for codigo in range(1, len(ERRORES)):
+        if conteo[codigo]:
+            print(f"   • {COLUMNA_ERROR}={codigo} ({ERRORES[codigo]}): {int(conteo[codigo])}")
+    print(f"📁 Predicciones guardadas en: {salida}")
+    return conteo
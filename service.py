@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Lógica del servicio de predicción compartida por la aplicación Flask (app.py)
+y la aplicación ASGI nativa (asgi_app.py)
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from jinja2 import Environment
+
+from artifact_store import file_lock
+from model_registry import ModelRegistry
+from inference import BatchError, ERRORES, NIVELES, parse_batch, validate_batch
+from http_cache import CachedPage
+from metrics import SIN_MEDIR, Metricas
+from prediction_cache import PredictionCache
+
+# Configuración
+MODEL_PATH = './artifacts/modelo.joblib'
+SCALER_PATH = './artifacts/scaler.joblib'
+ARTIFACTS_DIR = os.path.dirname(MODEL_PATH)
+SAMPLE_DATA_PATH = './sample_data.csv'
+
+# Registro del modelo: se carga una vez por worker y se comparte entre peticiones
+registry = ModelRegistry(MODEL_PATH, SCALER_PATH,
+                         check_interval=float(os.environ.get('MODEL_CHECK_INTERVAL', 1.0)),
+                         use_table=os.environ.get('PRICE_TABLE') == '1')
+
+# Caché de predicciones individuales; se vacía al recargar el modelo
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 0)),
+    ttl=float(os.environ['PREDICTION_CACHE_TTL']) if os.environ.get('PREDICTION_CACHE_TTL') else None)
+registry.subscribe(prediction_cache.clear)
+
+# Latencias por ruta y fase, peticiones en curso y contadores (/metrics)
+metrics = Metricas()
+
+# Respaldo para artefactos sin metadata.json (entrenados antes de exportarlo)
+MODEL_INFO = {
+    'algorithm': 'LinearRegression',
+    'r2': 0.9783,
+    'rmse': 11.60
+}
+INFO_RESPALDO = {
+    'metrics': {'r2': 0.9783, 'rmse': 11.60, 'mae': 8.24},
+    'equation': 'Precio = 242.65 + 54.08 × size + 10.91 × bedrooms + 2.73 × age',
+}
+
+# HTML template para la interfaz web
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Predicción de Precios de Inmuebles</title>
+    <style>
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }
+        .container {
+            background: white;
+            padding: 30px;
+            border-radius: 10px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #2c3e50;
+            text-align: center;
+            margin-bottom: 30px;
+        }
+        .form-group {
+            margin-bottom: 20px;
+        }
+        label {
+            display: block;
+            margin-bottom: 5px;
+            font-weight: bold;
+            color: #34495e;
+        }
+        input[type="number"] {
+            width: 100%;
+            padding: 10px;
+            border: 2px solid #ddd;
+            border-radius: 5px;
+            font-size: 16px;
+        }
+        input[type="number"]:focus {
+            border-color: #3498db;
+            outline: none;
+        }
+        button {
+            background-color: #3498db;
+            color: white;
+            padding: 12px 30px;
+            border: none;
+            border-radius: 5px;
+            font-size: 16px;
+            cursor: pointer;
+            width: 100%;
+        }
+        button:hover {
+            background-color: #2980b9;
+        }
+        .result {
+            margin-top: 20px;
+            padding: 20px;
+            background-color: #e8f5e8;
+            border-radius: 5px;
+            border-left: 4px solid #27ae60;
+        }
+        .error {
+            background-color: #ffeaea;
+            border-left-color: #e74c3c;
+        }
+        .info {
+            background-color: #e3f2fd;
+            border-left: 4px solid #2196f3;
+            margin-bottom: 20px;
+        }
+        .metrics {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 15px;
+            margin-top: 20px;
+        }
+        .metric {
+            background: #f8f9fa;
+            padding: 15px;
+            border-radius: 5px;
+            text-align: center;
+        }
+        .metric h3 {
+            margin: 0 0 10px 0;
+            color: #2c3e50;
+        }
+        .metric p {
+            margin: 0;
+            font-size: 18px;
+            font-weight: bold;
+            color: #27ae60;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🏠 Predicción de Precios de Inmuebles</h1>
+        
+        <div class="info">
+            <h3>📊 Información del Modelo</h3>
+            <p><strong>Algoritmo:</strong> Regresión Lineal</p>
+            <p><strong>R²:</strong> {{ "%.2f"|format(modelo.r2 * 100) }}% | <strong>RMSE:</strong> {{ "%.2f"|format(modelo.rmse) }} miles de dólares</p>
+            <p><strong>Variables:</strong> Tamaño (m²), Habitaciones, Edad (años)</p>
+        </div>
+
+        <form method="POST">
+            <div class="form-group">
+                <label for="size">Tamaño del inmueble (m²):</label>
+                <input type="number" id="size" name="size" min="40" max="120" step="1" required 
+                       placeholder="Ej: 80">
+            </div>
+            
+            <div class="form-group">
+                <label for="bedrooms">Número de habitaciones:</label>
+                <input type="number" id="bedrooms" name="bedrooms" min="1" max="5" step="1" required 
+                       placeholder="Ej: 3">
+            </div>
+            
+            <div class="form-group">
+                <label for="age">Edad del inmueble (años):</label>
+                <input type="number" id="age" name="age" min="1" max="35" step="1" required 
+                       placeholder="Ej: 15">
+            </div>
+            
+            <button type="submit">🔮 Predecir Precio</button>
+        </form>
+
+        {% if prediction %}
+        <div class="result">
+            <h3>💰 Resultado de la Predicción</h3>
+            <p><strong>Precio estimado:</strong> ${{ "%.0f"|format(prediction) }}k</p>
+            <p><strong>Características:</strong> {{ size }}m², {{ bedrooms }} habitaciones, {{ age }} años</p>
+        </div>
+        {% endif %}
+
+        {% if error %}
+        <div class="result error">
+            <h3>❌ Error</h3>
+            <p>{{ error }}</p>
+        </div>
+        {% endif %}
+
+        <div class="metrics">
+            <div class="metric">
+                <h3>📈 R²</h3>
+                <p>{{ "%.2f"|format(modelo.r2 * 100) }}%</p>
+            </div>
+            <div class="metric">
+                <h3>📊 RMSE</h3>
+                <p>{{ "%.2f"|format(modelo.rmse) }}k</p>
+            </div>
+            <div class="metric">
+                <h3>🎯 MAE</h3>
+                <p>{{ "%.2f"|format(modelo.mae) }}k</p>
+            </div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Plantilla compilada una sola vez (autoescape como render_template_string)
+PAGE_TEMPLATE = Environment(autoescape=True).from_string(HTML_TEMPLATE)
+
+def render_page(**context):
+    """Renderizar la interfaz web con las métricas del modelo servido"""
+    return PAGE_TEMPLATE.render(modelo=model_metadata(registry.current)[1]['metrics'], **context)
+
+# (versión, model_info, payload de /api/info, bytes de /api/info) del modelo servido
+_info = None
+
+def json_body(payload):
+    """Serializar como jsonify: claves ordenadas, compacto, con salto final"""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode() + b'\n'
+
+def model_metadata(handle):
+    """
+    (model_info, payload de /api/info, bytes de /api/info) a partir de los
+    metadatos de la versión; se construyen una vez por versión del modelo
+    """
+    global _info
+    version = handle.version if handle is not None else None
+    info = _info
+    if info is None or info[0] != version:
+        info = _info = (version, *_build_model_metadata(handle))
+    return info[1:]
+
+def _build_model_metadata(handle):
+    metadatos = (handle.metadatos if handle is not None else None) or {}
+    metricas = metadatos.get('metrics', {}).get('test') or INFO_RESPALDO['metrics']
+    payload = {
+        'name': 'Modelo de Predicción de Precios de Inmuebles',
+        'version': '1.0.0',
+        'algorithm': metadatos.get('algorithm', 'LinearRegression'),
+        'features': metadatos.get('features', ['size', 'bedrooms', 'age']),
+        'target': metadatos.get('target', 'price'),
+        'metrics': metricas,
+        'equation': metadatos.get('equation', INFO_RESPALDO['equation']),
+    }
+    if metadatos:
+        payload['model'] = {
+            'version': handle.version,
+            'artifacts': handle.origen,
+            'trained_at': metadatos.get('trained_at'),
+            'training_rows': metadatos.get('training_rows'),
+            'test_rows': metadatos.get('test_rows'),
+            'coefficients': metadatos.get('coefficients'),
+            'feature_ranges': metadatos.get('feature_ranges'),
+            'metrics_train': metadatos.get('metrics', {}).get('train'),
+        }
+    model_info = {'algorithm': payload['algorithm'], 'r2': metricas['r2'],
+                  'rmse': metricas['rmse']} if metadatos else MODEL_INFO
+    return model_info, payload, json_body(payload)
+
+_landing_page = None
+
+def landing_page():
+    """Página GET / pre-renderizada; se regenera solo si cambia el modelo"""
+    global _landing_page
+    try:
+        handle = registry.get()
+    except Exception:
+        handle = None
+    version = handle.version if handle is not None else None
+    page = _landing_page
+    if page is None or page.key != version:
+        mtime = handle.firma[0][0] / 1e9 if handle is not None else time.time()
+        page = _landing_page = CachedPage(render_page().encode(), key=version, mtime=mtime)
+    return page
+
+def _train_fallback_model():
+    """Entrenar un modelo de ejemplo cuando no existen los artefactos"""
+    print("⚠️  Modelo no encontrado, entrenando automáticamente...")
+    
+    # Crear datos de ejemplo y entrenar
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.model_selection import train_test_split
+    from crispdm_inmuebles import calcular_metricas, estadisticos_ajuste, guardar_modelo
+    
+    # Datos de ejemplo
+    data = {
+        'size': [50, 60, 45, 70, 80, 90, 55, 65, 75, 85],
+        'bedrooms': [1, 2, 1, 3, 3, 4, 2, 2, 3, 4],
+        'age': [5, 10, 2, 15, 20, 25, 8, 12, 18, 22],
+        'price': [150, 180, 140, 220, 250, 300, 160, 190, 240, 280]
+    }
+    df = pd.DataFrame(data)
+    
+    # Preparar datos
+    X = df[['size', 'bedrooms', 'age']]
+    y = df['price']
+    
+    # Dividir y escalar
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
+    # Entrenar modelo
+    modelo = LinearRegression()
+    modelo.fit(X_train_scaled, y_train)
+    
+    # Publicar como una versión más (artifacts/v<N>/ + manifiesto), igual que
+    # el script de entrenamiento; _train_once ya tiene el bloqueo
+    guardar_modelo(modelo, scaler, ARTIFACTS_DIR,
+                   estadisticos_ajuste(X, y, X_train, X_test, y_train, y_test),
+                   calcular_metricas(y_train, modelo.predict(X_train_scaled),
+                                     y_test, modelo.predict(X_test_scaled)),
+                   bloquear=False)
+    
+    print("✅ Modelo entrenado y guardado automáticamente")
+
+# Entrenamiento automático en curso (single-flight por proceso)
+_training = None
+_training_lock = threading.Lock()
+
+def _train_once():
+    """Entrenar una sola vez; las peticiones concurrentes esperan el mismo resultado"""
+    global _training
+    with _training_lock:
+        future = _training
+        owner = future is None
+        if owner:
+            future = _training = Future()
+    if not owner:
+        return future.result()
+    
+    try:
+        # Bloqueo exclusivo entre workers: solo uno entrena y escribe
+        with file_lock(ARTIFACTS_DIR):
+            if not all(map(os.path.exists, registry.paths())):
+                _train_fallback_model()
+        future.set_result(registry.reload())
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _training_lock:
+            _training = None
+    return future.result()
+
+def get_model_handle():
+    """Obtener el handle compartido del modelo, entrenando si no existe"""
+    handle = registry.get()
+    if handle is None:
+        handle = _train_once()
+    return handle
+
+def current_handle():
+    """Handle del modelo, o None si no se pudo cargar ni entrenar"""
+    try:
+        return get_model_handle()
+    except Exception as e:
+        print(f"❌ Error cargando/entrenando modelo: {e}")
+        return None
+
+def load_model():
+    """Cargar modelo y scaler"""
+    handle = current_handle()
+    if handle is None:
+        return None, None
+    return handle.modelo, handle.scaler
+
+def predict_price(size, bedrooms, age, peticion=SIN_MEDIR):
+    """Realizar predicción de precio"""
+    handle = current_handle()
+    peticion.fase('modelo')
+    return _predict_with(handle, size, bedrooms, age, peticion)
+
+def _predict_with(handle, size, bedrooms, age, peticion=SIN_MEDIR):
+    """predict_price() con un handle ya obtenido"""
+    try:
+        if handle is None:
+            return None, "Modelo no disponible. Ejecute primero el entrenamiento."
+        
+        # Validar rangos (siempre, también antes de consultar la caché)
+        if not (40 <= size <= 120):
+            return None, "Tamaño debe estar entre 40 y 120 m²"
+        if not (1 <= bedrooms <= 5):
+            return None, "Habitaciones debe estar entre 1 y 5"
+        if not (1 <= age <= 35):
+            return None, "Edad debe estar entre 1 y 35 años"
+        peticion.fase('validacion')
+        
+        # La caché (desactivada por defecto) solo compensa si puntuar es más
+        # caro que una consulta con lock; con el modelo fusionado no lo es
+        clave = None
+        if prediction_cache.maxsize:
+            clave = prediction_cache.key(handle.version, size, bedrooms, age)
+            precio_predicho = prediction_cache.get(clave)
+            peticion.fase('cache')
+            if precio_predicho is not None:
+                return precio_predicho, None
+        
+        # Predicción con el modelo fusionado (sin sklearn en la ruta caliente);
+        # el escalado está plegado en los pesos, no es una fase aparte
+        precio_predicho = handle.engine.predict_one(size, bedrooms, age)
+        if clave is not None:
+            prediction_cache.put(clave, precio_predicho)
+        peticion.fase('prediccion')
+        
+        return precio_predicho, None
+    except Exception as e:
+        return None, f"Error en predicción: {str(e)}"
+
+def warm_up():
+    """Cargar y precalentar modelo, página y rutas antes de aceptar tráfico"""
+    handle = current_handle()
+    if handle is None:
+        return False
+    registry.warm_up()
+    predict_price(80, 3, 15)
+    api_batch_response({'size': [80, 50], 'bedrooms': [3, 1], 'age': [15, 25]})
+    landing_page()
+    watch_model()
+    return True
+
+def watch_model():
+    """
+    Cargar las versiones nuevas del modelo en segundo plano en lugar de
+    comprobar el disco en las peticiones (MODEL_WATCH=0 lo desactiva)
+    """
+    if os.environ.get('MODEL_WATCH', '1') != '0':
+        registry.watch()
+
+def form_context(form, peticion=SIN_MEDIR):
+    """Contexto de la plantilla para un envío del formulario web"""
+    try:
+        # Obtener datos del formulario
+        size = float(form['size'])
+        bedrooms = int(form['bedrooms'])
+        age = int(form['age'])
+        peticion.fase('parseo')
+        
+        # Realizar predicción
+        prediction, error = predict_price(size, bedrooms, age, peticion)
+        
+        if error:
+            return {'error': error}
+        
+        return {
+            'prediction': prediction,
+            'size': size,
+            'bedrooms': bedrooms,
+            'age': age
+        }
+        
+    except Exception as e:
+        return {'error': f"Error: {str(e)}"}
+
+def api_predict_response(data, peticion=SIN_MEDIR):
+    """Respuesta de /api/predict como (payload, status)"""
+    try:
+        if not data:
+            return {'error': 'No se proporcionaron datos'}, 400
+        
+        size = float(data.get('size', 0))
+        bedrooms = int(data.get('bedrooms', 0))
+        age = int(data.get('age', 0))
+        peticion.fase('parseo')
+        
+        # Un solo handle para el precio y su intervalo, aunque se publique
+        # una versión nueva a mitad de la petición
+        handle = current_handle()
+        peticion.fase('modelo')
+        prediction, error = _predict_with(handle, size, bedrooms, age, peticion)
+        
+        if error:
+            return {'error': error}, 400
+        
+        intervalo = None
+        if handle.intervalos is not None:
+            semi = handle.intervalos.half_widths_one(size, bedrooms, age)
+            intervalo = {nivel: {'lower': round(prediction - s, 2), 'upper': round(prediction + s, 2)}
+                         for nivel, s in zip(NIVELES, semi)}
+            peticion.fase('intervalo')
+        
+        return {
+            'prediction': round(prediction, 2),
+            'prediction_interval': intervalo,
+            'features': {
+                'size': size,
+                'bedrooms': bedrooms,
+                'age': age
+            },
+            'model_info': model_metadata(handle)[0]
+        }, 200
+        
+    except Exception as e:
+        return {'error': f'Error interno: {str(e)}'}, 500
+
+def _redondear(valores, validas):
+    """Lista JSON con 2 decimales y None en las filas inválidas"""
+    return [round(v, 2) if ok else None for v, ok in zip(valores.tolist(), validas.tolist())]
+
+def api_batch_response(data, peticion=SIN_MEDIR):
+    """Respuesta de /api/predict/batch como (payload, status)"""
+    try:
+        if not data:
+            return {'error': 'No se proporcionaron datos'}, 400
+        
+        X = parse_batch(data)
+        peticion.fase('parseo')
+        
+        handle = current_handle()
+        peticion.fase('modelo')
+        if handle is None:
+            return {'error': 'Modelo no disponible. Ejecute primero el entrenamiento.'}, 503
+        
+        # Como inference.score_batch, con la validación medida por separado
+        codigos = validate_batch(X)
+        validas = codigos == 0
+        peticion.fase('validacion')
+        predicciones = np.full(len(X), np.nan)
+        predicciones[validas] = handle.engine.predict(X[validas])
+        peticion.fase('prediccion')
+        
+        intervalos = None
+        if handle.intervalos is not None:
+            semi = np.full((len(X), len(NIVELES)), np.nan)
+            semi[validas] = handle.intervalos.half_widths(X[validas])
+            intervalos = {nivel: {'lower': _redondear(predicciones - semi[:, i], validas),
+                                  'upper': _redondear(predicciones + semi[:, i], validas)}
+                          for i, nivel in enumerate(NIVELES)}
+            peticion.fase('intervalo')
+        
+        return {
+            'predictions': _redondear(predicciones, validas),
+            'prediction_intervals': intervalos,
+            'errors': [{'index': int(i), 'error': ERRORES[codigos[i]]}
+                       for i in np.flatnonzero(~validas)],
+            'count': len(X),
+            'valid': int(validas.sum()),
+            'model_info': model_metadata(handle)[0]
+        }, 200
+        
+    except BatchError as e:
+        return {'error': str(e)}, e.status
+    except Exception as e:
+        return {'error': f'Error interno: {str(e)}'}, 500
+
+def health_response():
+    """Respuesta de /api/health (solo estado en memoria, nunca carga ni entrena)"""
+    handle = registry.current
+    status = "healthy" if handle is not None else "unhealthy"
+    
+    return {
+        'status': status,
+        'model_loaded': handle is not None,
+        'scaler_loaded': handle is not None
+    }
+
+def readiness_response():
+    """Respuesta de /api/ready como (payload, status), sin tocar el disco"""
+    estado = registry.status()
+    ready = estado['model_loaded'] and estado['warmed_up']
+    if estado['loaded_at'] is not None:
+        estado['loaded_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(estado['loaded_at']))
+    
+    return {'ready': ready, **estado, 'prediction_cache': prediction_cache.stats()}, 200 if ready else 503
+
+def info_response():
+    """Respuesta de /api/info (metadatos del modelo servido, sin tocar el disco)"""
+    return model_metadata(registry.current)[1]
+
+def info_body():
+    """Cuerpo JSON de /api/info, precalculado para la versión servida"""
+    return model_metadata(registry.current)[2]
+
+def _metricas_cache():
+    estado = prediction_cache.stats()
+    return [
+        ('prediction_cache_hits_total', 'counter', 'Aciertos de la caché de predicciones',
+         [('', estado['hits'])]),
+        ('prediction_cache_misses_total', 'counter', 'Fallos de la caché de predicciones',
+         [('', estado['misses'])]),
+        ('prediction_cache_evictions_total', 'counter', 'Entradas desalojadas por tamaño',
+         [('', estado['evictions'])]),
+        ('prediction_cache_hit_ratio', 'gauge', 'Aciertos / consultas desde el arranque',
+         [('', estado['hit_rate'] or 0)]),
+        ('prediction_cache_size', 'gauge', 'Entradas en la caché de predicciones',
+         [('', estado['size'])]),
+    ]
+
+def _metricas_modelo():
+    estado = registry.status()
+    metricas = [
+        ('model_loads_total', 'counter', 'Versiones del modelo cargadas por este proceso',
+         [('', estado['loads'])]),
+        ('model_loaded', 'gauge', '1 si hay un modelo cargado',
+         [(f'version="{estado["version"]}"' if estado['version'] else '',
+           int(estado['model_loaded']))]),
+    ]
+    if estado['load_ms'] is not None:
+        metricas.append(('model_last_load_seconds', 'gauge', 'Duración de la última carga',
+                         [('', estado['load_ms'] / 1000)]))
+    if estado['warmup_ms'] is not None:
+        metricas.append(('model_warmup_seconds', 'gauge', 'Duración del último precalentamiento',
+                         [('', estado['warmup_ms'] / 1000)]))
+    return metricas
+
+metrics.registrar_colector(_metricas_cache)
+metrics.registrar_colector(_metricas_modelo)
+
+def metrics_response():
+    """Cuerpo de /metrics (formato de texto de Prometheus)"""
+    return metrics.exportar()
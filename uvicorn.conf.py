@@ -1,26 +1,48 @@
 # Configuración de Uvicorn para Render
+# Modo multi-proceso: gunicorn main:app -c uvicorn.conf.py
 
-# Configuración del servidor
-host = "0.0.0.0"
-port = 10000
-workers = 1
-worker_class = "uvicorn.workers.UvicornWorker"
+import os
 
-# Configuración de rendimiento
-loop = "auto"
-http = "auto"
-ws = "auto"
-lifespan = "auto"
+# Configuración del servidor (las opciones son las de gunicorn; el worker
+# las traslada a Uvicorn)
+bind = f"0.0.0.0:{int(os.environ.get('PORT', 10000))}"
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn_worker.Worker"
 
-# Configuración de logs
-log_level = "info"
-access_log = True
+# Cargar la aplicación y el modelo una sola vez en el proceso padre: los
+# workers se crean con fork y comparten los pesos mapeados en memoria
+preload_app = True
+
+# Configuración de logs (accesslog = "-": una línea por petición en stdout)
+loglevel = "info"
+accesslog = "-"
 
 # Configuración de timeouts
-timeout_keep_alive = 30
-timeout_graceful_shutdown = 30
+keepalive = 30
+graceful_timeout = 30
 
-# Configuración de seguridad
-limit_concurrency = 1000
-limit_max_requests = 1000
+# Configuración de seguridad: conexiones concurrentes por worker (503 por
+# encima). El reciclado de workers está desactivado por defecto (cada
+# reciclado pierde las métricas y la caché del proceso); MAX_REQUESTS > 0
+# lo activa tras ese número de peticiones (± 10%)
+worker_connections = 1000
+max_requests = int(os.environ.get("MAX_REQUESTS") or 0)
+max_requests_jitter = max_requests // 10
 backlog = 2048
+
+
+def on_starting(server):
+    """Cargar el modelo en el proceso padre antes de crear los workers"""
+    import service
+    if service.current_handle() is None:
+        server.log.warning("Modelo no disponible al arrancar; cada worker lo cargará")
+
+
+def post_fork(server, worker):
+    # El precalentamiento por worker ocurre en el lifespan startup de
+    # asgi_app, antes de que uvicorn empiece a aceptar conexiones
+    import service
+    if service.registry.current is not None:
+        server.log.info("Worker %s creado (modelo heredado del proceso padre)", worker.pid)
+    else:
+        server.log.info("Worker %s creado (cargará el modelo en el arranque)", worker.pid)
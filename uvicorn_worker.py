@@ -0,0 +1,16 @@
+"""
+Worker de Uvicorn para gunicorn con límite de conexiones concurrentes
+
+UvicornWorker traslada a Uvicorn keepalive, backlog, max_requests y los
+logs de gunicorn, pero no un límite de concurrencia: este worker usa
+`worker_connections` como `limit_concurrency` (503 por encima del límite).
+"""
+
+from uvicorn.workers import UvicornWorker
+
+
+class Worker(UvicornWorker):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.limit_concurrency = self.cfg.worker_connections
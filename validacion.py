@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Validación cruzada e intervalos de confianza sin reajustar el modelo
+La validación k-fold se calcula con los estadísticos suficientes de cada
+pliegue (el ajuste sin el pliegue f es total − pliegue f: O(p³) por
+pliegue), leave-one-out con la diagonal de la matriz sombrero y los
+intervalos con un bootstrap de Poisson vectorizado sobre los residuos de
+prueba, repartido en procesos cuando el trabajo es grande
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from estadisticos import TRAMO, EstadisticosSuficientes
+
+# Pesos × filas del bootstrap a partir de los cuales se usa un pool de procesos
+UMBRAL_PROCESOS = 50_000_000
+
+# Pesos por tarea del bootstrap (réplicas × filas de un tramo)
+PESOS_POR_TAREA = 4_000_000
+
+# Filas de prueba mínimas para los intervalos bootstrap: con menos, muchas
+# réplicas repiten una sola fila (SST = 0) y los percentiles no son fiables
+MIN_FILAS_BOOTSTRAP = 20
+
+# Cuantiles de Poisson(1) para cada valor de un uint16: generar un peso
+# cuesta un entero aleatorio y una consulta en lugar de rng.poisson (~5×)
+_PROBABILIDADES = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)])
+_POISSON_1 = np.searchsorted(_PROBABILIDADES, (np.arange(1 << 16) + 0.5) / (1 << 16)) \
+    .astype(np.float64)
+
+
+def _metricas(sse, sst, n, sae):
+    """(R², RMSE, MAE) a partir de sumas (escalares o arrays)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - sse / sst, np.sqrt(sse / n), sae / n
+
+
+def asignar_pliegues(n, k, seed=42):
+    """Índices de las filas de cada uno de los k pliegues (permutación aleatoria)"""
+    return np.array_split(np.random.default_rng(seed).permutation(n), k)
+
+
+def validacion_cruzada(X, y, k=5, seed=42):
+    """
+    R², RMSE y MAE de cada pliegue de una validación k-fold
+
+    Cada pliegue se recorre una vez para sus estadísticos; el modelo sin el
+    pliegue se obtiene restándolos del total, sin volver a ajustar sobre
+    los datos. Devuelve un array (k, 3).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if not 2 <= k <= len(y):
+        raise ValueError(f"El número de pliegues debe estar entre 2 y {len(y)}: {k}")
+    pliegues = asignar_pliegues(len(y), k, seed)
+    stats = [EstadisticosSuficientes.desde_datos(X[idx], y[idx]) for idx in pliegues]
+    total = EstadisticosSuficientes(X.shape[1])
+    for s in stats:
+        total.fusionar(s)
+
+    resultados = np.empty((k, 3))
+    for f, (idx, prueba) in enumerate(zip(pliegues, stats)):
+        pesos, intercepto = (total - prueba).coeficientes()
+        sae = float(np.abs(y[idx] - X[idx] @ pesos - intercepto).sum())
+        resultados[f] = _metricas(prueba.sse(pesos, intercepto), prueba.cyy, prueba.n, sae)
+    return resultados
+
+
+def leave_one_out(X, y):
+    """
+    (R², RMSE, MAE) leave-one-out sin n ajustes: el residuo de la fila i sin
+    ella es e_i / (1 − h_ii), con h_ii la diagonal de la matriz sombrero
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    total = EstadisticosSuficientes.desde_datos(X, y)
+    pesos, intercepto = total.coeficientes()
+    # Con X centrada, h_ii = 1/n + x_iᵀ Cxx⁻¹ x_i
+    cxx_inv = np.linalg.pinv(total.cxx)
+    press = sae = 0.0
+    for i in range(0, len(y), TRAMO):
+        Xc = X[i:i + TRAMO] - total.media_x
+        h = 1 / total.n + np.einsum('ij,jk,ik->i', Xc, cxx_inv, Xc)
+        e = (y[i:i + TRAMO] - total.media_y - Xc @ pesos) / (1 - h)
+        press += float(e @ e)
+        sae += float(np.abs(e).sum())
+    return tuple(map(float, _metricas(press, total.cyy, total.n, sae)))
+
+
+def _sumas_bootstrap(columnas, replicas, semilla):
+    """Sumas ponderadas (réplicas, 5) de un tramo con pesos Poisson(1)"""
+    rng = np.random.default_rng(semilla)
+    pesos = _POISSON_1[rng.integers(0, 1 << 16, (replicas, len(columnas)), dtype=np.uint16)]
+    return pesos @ columnas
+
+
+def intervalos_bootstrap(y, residuos, replicas=1000, nivel=0.95, seed=42, jobs=None):
+    """
+    Intervalos de confianza percentiles de R², RMSE y MAE sobre (y, residuos)
+
+    Bootstrap de Poisson: cada fila recibe en cada réplica un peso
+    Poisson(1), de modo que las filas se procesan por tramos independientes
+    (con su propia semilla) y el resultado no depende del número de
+    procesos. Las réplicas con una métrica no finita (p. ej. R² con SST = 0
+    si todas las filas remuestreadas tienen el mismo precio) se descartan.
+    Devuelve {métrica: (inferior, superior)}.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    residuos = np.asarray(residuos, dtype=np.float64)
+    # Centrar y evita la cancelación en Σw·y² − (Σw·y)²/Σw
+    yc = y - y.mean()
+    columnas = np.column_stack([np.ones_like(yc), yc, yc * yc, residuos * residuos,
+                                np.abs(residuos)])
+
+    filas = max(1, PESOS_POR_TAREA // replicas)
+    tramos = [columnas[i:i + filas] for i in range(0, len(y), filas)]
+    semillas = np.random.SeedSequence(seed).spawn(len(tramos))
+    if jobs is None:
+        jobs = (os.cpu_count() or 1) if replicas * len(y) >= UMBRAL_PROCESOS else 1
+    jobs = min(jobs, len(tramos))
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            parciales = pool.map(_sumas_bootstrap, tramos, [replicas] * len(tramos), semillas)
+            sumas = sum(parciales)
+    else:
+        sumas = sum(_sumas_bootstrap(t, replicas, s) for t, s in zip(tramos, semillas))
+
+    n, sy, syy, sse, sae = sumas.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sst = syy - sy * sy / n
+    r2, rmse, mae = _metricas(sse, sst, n, sae)
+    alfa = (1 - nivel) / 2 * 100
+    intervalos = {}
+    for nombre, valores in (('r2', r2), ('rmse', rmse), ('mae', mae)):
+        valores = valores[np.isfinite(valores)]
+        intervalos[nombre] = (tuple(np.percentile(valores, [alfa, 100 - alfa]).tolist())
+                              if len(valores) else (math.nan, math.nan))
+    return intervalos